@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+'''
+    Animations of the graphs year by year (in graphs/animations/, see animation.py): the fuel consumption lines drawn
+    up to each year in turn, and the CO2 emissions bars ranked again for each year
+
+    The data is loaded once, and the frames are rendered in parallel by a pool of warm render workers (those of the
+    render service if it is running) and encoded as they come. Encoding uses ffmpeg if it is installed (gif, mp4,
+    webp), otherwise Pillow (gif, webp).
+
+    Usage: python animate-graphs.py [--only lines co2] [--format gif] [--highlight France] [--jobs 4]
+           python animate-graphs.py --format mp4 --frame-duration 1 --hold 3
+           python animate-graphs.py --scale 2   # Frames at twice the size
+'''
+
+import argparse
+import os
+import time
+
+import animation
+import countries
+import datasets
+import export
+
+animations_directory = export.graphs_directory / 'animations'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(animation.animations),
+                        help='Graphs to animate (default: all)')
+    parser.add_argument('--format', default='gif', choices=animation.formats)
+    parser.add_argument('--highlight', default='Canada', help='Highlighted country')
+    parser.add_argument('--frame-duration', type=float, default=0.7, help='Seconds each year is shown')
+    parser.add_argument('--hold', type=float, default=2.0, help='Seconds the last year is shown for in addition')
+    parser.add_argument('--scale', type=float, help='Scale of the frames (e.g. 2 for twice the width and height)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='Number of render workers (when no render service is running)')
+    args = parser.parse_args()
+    if args.format == 'mp4' and animation.ffmpeg_executable() is None:
+        parser.error('ffmpeg is needed to write mp4 animations')
+
+    names = args.only or list(animation.animations)
+    tables = datasets.load(sorted({table for name in names for table in animation.animations[name]['tables']}))
+    animations_directory.mkdir(parents=True, exist_ok=True)
+    filename = countries.normalize(args.highlight).replace(' ', '-')
+    with export.render_pool(size=max(1, args.jobs)) as pool:
+        for name in names:
+            start = time.perf_counter()
+            filepath = animations_directory / '{}.{}'.format(animation.animations[name]['filename'].format(filename),
+                                                              args.format)
+            try:
+                number_of_frames = animation.write_animation(
+                    pool, name, tables, filepath, format=args.format, highlight=args.highlight,
+                    frame_duration=args.frame_duration, hold=args.hold, window=2 * max(1, args.jobs), scale=args.scale)
+            except ValueError as error:
+                print('Skipped {}: {}'.format(name, error))
+                continue
+            print('Wrote {} ({} frames) in {:.2f}s'.format(filepath, number_of_frames, time.perf_counter() - start))
@@ -0,0 +1,225 @@
+'''
+    Animations of the graphs year by year: the fuel consumption lines drawn up to each year in turn, and the CO2
+    emissions bars ranked again for each year (see animate-graphs.py)
+
+    The frames are built one by one from the data loaded once, and rendered in parallel by a pool of warm render
+    workers (those of the render service if it is running, see renderer.py): at most window frames are being rendered
+    or waiting to be encoded at a time, whatever the number of frames. The frames are streamed to the encoder in order
+    as they are rendered: ffmpeg through a pipe if it is installed (gif, mp4, webp), otherwise Pillow (gif and webp,
+    Pillow keeps every frame until the animation is written, up to pillow_max_frame_bytes). The animation is encoded
+    into a temporary file that only replaces the output once it is complete.
+
+    Every frame has the axis ranges of the full graph, so that the lines or bars don't move around from one frame to
+    the next.
+'''
+
+from collections import deque
+from pathlib import Path
+import io
+import json
+import shutil
+import subprocess
+
+import numpy as np
+
+import charts
+import datasets
+import export
+import layers
+
+formats = ['gif', 'mp4', 'webp']
+encoders = ['ffmpeg', 'pillow']
+
+# Pillow keeps every frame of an animation until it is written, decoded (1 byte a pixel for a gif, 4 for a webp):
+# animations whose frames take more are left to ffmpeg
+pillow_max_frame_bytes = 512 * 2**20
+
+# Encoder options of ffmpeg by output format (after the frames are read from its standard input)
+ffmpeg_options = {
+    # Palette computed from every frame rather than a generic one
+    'gif': ['-filter_complex', '[0:v]split[a][b];[a]palettegen[palette];[b][palette]paletteuse', '-loop', '0'],
+    # Dimensions padded to even numbers, and a frame rate players expect
+    'mp4': ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-r', '25',
+            '-movflags', '+faststart'],
+    'webp': ['-c:v', 'libwebp_anim', '-lossless', '1', '-loop', '0']
+}
+
+
+def ffmpeg_executable():
+    ''' Path of ffmpeg, None if it isn't installed '''
+    return shutil.which('ffmpeg')
+
+
+def pillow_image():
+    ''' PIL.Image, imported only when animations are encoded without ffmpeg '''
+    # Installing Pillow: https://pillow.readthedocs.io/en/stable/installation.html
+    from PIL import Image
+
+    return Image
+
+
+def data_until(plotting_data, year):
+    ''' Fuel consumption plotting data (see charts.fuel_consumption_plotting_data) up to a year '''
+    truncated_data = {}
+    for country, country_data in plotting_data.items():
+        shown = np.asarray(country_data['years']) <= year
+        truncated_data[country] = {key: np.asarray(values)[shown] for key, values in country_data.items()}
+    return truncated_data
+
+
+def fuel_consumption_frames(tables, country_names, highlight='Canada'):
+    ''' Fuel consumption graph up to each year with data in turn, from the first year the highlighted country has data
+        for (built as the frames are iterated)
+
+        The last frame is the full graph (see charts.fuel_consumption_figure), whose axis ranges every frame has.
+    '''
+    plotting_data = charts.fuel_consumption_plotting_data(tables['fuel-consumption'])
+    if highlight not in plotting_data or len(plotting_data[highlight]['years']) == 0:
+        raise ValueError('No fuel consumption data for {}'.format(highlight))
+    first_year = int(np.min(plotting_data[highlight]['years']))
+    years = sorted({int(year) for country_data in plotting_data.values() for year in country_data['years']
+                    if year >= first_year})
+    last_frame = charts.fuel_consumption_figure(None, country_names, plotting_data, highlight)
+
+    def frames(full_layout):
+        for year in years[:-1]:
+            year_data = data_until(plotting_data, year)
+            skeleton = charts.fuel_consumption_skeleton(year_data, country_names)
+            fig = charts.highlight_fuel_consumption(skeleton, year_data, highlight, label_line_ends=True)
+            yield {'data': fig['data'], 'layout': layers.fixed_axes(fig['layout'], full_layout)}
+        yield last_frame
+
+    return last_frame, frames, len(years)
+
+
+def co2_emissions_frames(tables, highlight='Canada'):
+    ''' CO2 emissions graph of each year the highlighted country has emissions for, the bars sorted again every year '''
+    co2_emissions = tables['co2-emissions']
+    years = [year for year in charts.co2_emissions_years(co2_emissions)
+             if highlight in charts.co2_emissions_plotting_data(co2_emissions, year)[0]]
+    if not years:
+        raise ValueError('No CO2 emissions for {}'.format(highlight))
+    # Same scale for every year: up to the highest emissions of all years, with plotly's 5% padding
+    highest_emissions = max(np.nanmax(co2_emissions.column(year)) for year in years)
+
+    def frames(full_layout):
+        for year in years:
+            fig = charts.co2_emissions_figure(co2_emissions, highlight=highlight, year=year)
+            xaxis = dict(fig['layout']['xaxis'], range=[0, highest_emissions / 0.95], autorange=False)
+            yield {'data': fig['data'], 'layout': dict(fig['layout'], xaxis=xaxis)}
+
+    return None, frames, len(years)
+
+
+# Graphs animated by animate-graphs.py, by name: output file (in graphs/animations/, without extension, {} is replaced
+# with the highlighted country), tables used (see datasets.loaders) and a function returning the frame whose axis
+# ranges every frame has (None if the frames set them), a function building the frames from the full layout of that
+# frame, and the number of frames
+animations = {
+    'lines': dict(
+        filename='avg-fuel-consumption-{}-by-year',
+        tables=['fuel-consumption'],
+        frames=lambda tables, highlight: fuel_consumption_frames(
+            tables, charts.read_country_list(charts.country_list_filepath), highlight)
+    ),
+    'co2': dict(
+        filename='avg-co2-emissions-{}-by-year',
+        tables=['co2-emissions'],
+        frames=lambda tables, highlight: co2_emissions_frames(tables, highlight)
+    )
+}
+
+
+def rendered_frames(pool, frames, window, width=None, height=None, scale=None):
+    ''' PNG images of frames (an iterable of figures), in order, with at most window frames rendered ahead '''
+    pending = deque()
+    for frame in frames:
+        pending.append(export.submit_image(pool, frame, 'png', width, height, scale))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def encode_with_ffmpeg(images, filepath, format, frame_duration=0.7, hold=2.0):
+    ''' Encodes PNG images as they come by piping them to ffmpeg, the last one shown for hold more seconds '''
+    # Output format given rather than guessed from the extension (filepath may be a temporary file)
+    command = [ffmpeg_executable(), '-y', '-loglevel', 'error', '-f', 'image2pipe', '-framerate',
+               str(1 / frame_duration), '-c:v', 'png', '-i', '-'] + ffmpeg_options[format]
+    command += ['-f', format, str(filepath)]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        image = None
+        for image in images:
+            process.stdin.write(image)
+        # ffmpeg reads frames at a constant rate: the last one is held by repeating it
+        for repeat in range(round(hold / frame_duration)):
+            process.stdin.write(image)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass  # ffmpeg stopped: its error is reported below
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    # Not communicate(), which flushes stdin again after a broken pipe
+    errors = process.stderr.read()
+    process.wait()
+    if process.returncode != 0:
+        raise RuntimeError('ffmpeg failed to write {}: {}'.format(filepath, errors.decode(errors='replace').strip()))
+
+
+def encode_with_pillow(images, file, format, number_of_frames, frame_duration=0.7, hold=2.0):
+    ''' Encodes PNG images with Pillow (gif or webp) into a file, the last one shown for hold more seconds
+
+        Raises ValueError if the frames would take more than pillow_max_frame_bytes (Pillow keeps all of them).
+    '''
+    Image = pillow_image()
+    frames = (Image.open(io.BytesIO(image)) for image in images)
+    if format == 'gif':
+        # Palette of each frame's own colors, without dithering (which makes the thin grey lines look dotted)
+        frames = (frame.convert('RGB').quantize(256, dither=Image.Dither.NONE) for frame in frames)
+    durations = [round(frame_duration * 1000)] * number_of_frames
+    durations[-1] += round(hold * 1000)
+    options = dict(lossless=True) if format == 'webp' else {}
+    first_frame = next(frames)
+    frame_bytes = first_frame.width * first_frame.height * (1 if format == 'gif' else 4) * number_of_frames
+    if frame_bytes > pillow_max_frame_bytes:
+        raise ValueError('{} frames of {}x{} take too much memory for Pillow ({:.0f} MB): install ffmpeg'.format(
+            number_of_frames, first_frame.width, first_frame.height, frame_bytes / 2**20))
+    first_frame.save(file, format=format.upper(), save_all=True, append_images=frames, duration=durations,
+                     loop=0, **options)
+
+
+def write_animation(pool, name, tables, filepath, format='gif', highlight='Canada', frame_duration=0.7, hold=2.0,
+                    window=4, width=None, height=None, scale=None, encoder=None):
+    ''' Renders the frames of an animation of animations with pool and encodes them to filepath as they come
+
+        window: number of frames rendered ahead of the encoder (2 per render worker keeps them busy)
+        encoder: one of encoders (default: ffmpeg if it is installed, otherwise Pillow)
+    '''
+    if format not in formats:
+        raise ValueError('No {} animations (formats: {})'.format(format, ', '.join(formats)))
+    if encoder is None:
+        encoder = 'ffmpeg' if ffmpeg_executable() is not None else 'pillow'
+    use_ffmpeg = encoder == 'ffmpeg'
+    if use_ffmpeg and ffmpeg_executable() is None:
+        raise RuntimeError('ffmpeg is not installed (https://ffmpeg.org/download.html)')
+    if not use_ffmpeg and format == 'mp4':
+        raise RuntimeError('ffmpeg is needed to write mp4 animations (https://ffmpeg.org/download.html)')
+
+    reference, frames, number_of_frames = animations[name]['frames'](tables, highlight)
+    full_layout = None
+    if reference is not None:
+        # Axis ranges of the full graph, computed by plotly.js (the export engine's json format)
+        full_layout = json.loads(export.submit_image(pool, reference, 'json', width, height, scale).result())['layout']
+    images = rendered_frames(pool, frames(full_layout), window, width, height, scale)
+
+    def encode(file):
+        if use_ffmpeg:
+            encode_with_ffmpeg(images, file.name, format, frame_duration, hold)
+        else:
+            encode_with_pillow(images, file, format, number_of_frames, frame_duration, hold)
+    # A failed encode leaves the previous animation, if any, rather than a partial one
+    datasets.write_atomically(Path(filepath), encode)
+    return number_of_frames
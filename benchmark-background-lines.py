@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+'''
+    Benchmark of batched vs per-trace background lines (as drawn in average-fuel-consumption.py), and of the percentile
+    bands drawn instead of them by average-fuel-consumption.py --summary
+
+    Times figure construction, JSON serialization and (optionally) static image export for synthetic
+    fuel-consumption-shaped series, at the current 53 countries and at several thousand series.
+
+    Usage: python benchmark-background-lines.py [--series 53 1000 5000] [--export]
+           python benchmark-background-lines.py --series 53 50000 --modes batched bands
+'''
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+# Installing plotly: https://plot.ly/python/getting-started/
+import plotly.io as pio
+
+import charts
+
+# Integer years, as in the parsed tables (see datasets.Table)
+years = list(range(2005, 2018))
+background_line = dict(
+    width=1,
+    color='#ededed'
+)
+
+
+def synthetic_series(number_of_series):
+    ''' Fuel-consumption-like series (2005-2017) with a few missing years, like the GFEI data '''
+    rng = random.Random(0)
+    series = []
+    for i in range(number_of_series):
+        start = rng.uniform(6, 11)
+        series_years = []
+        series_values = []
+        for j, year in enumerate(years):
+            if year in (2006, 2007, 2009):
+                continue
+            series_years.append(year)
+            series_values.append(round(start - 0.15 * j + rng.uniform(-0.2, 0.2), 1))
+        series.append((series_years, series_values))
+    return series
+
+
+def series_matrix(series):
+    ''' Country x year matrix of series (NaN for missing years), like the parsed GFEI tables (see datasets.py) '''
+    matrix = np.full((len(series), len(years)), np.nan)
+    year_index = {year: j for j, year in enumerate(years)}
+    for i, (series_years, series_values) in enumerate(series):
+        matrix[i, [year_index[year] for year in series_years]] = series_values
+    return matrix
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def build_figure(data, mode):
+    if mode == 'bands':
+        # From the country x year matrix, as charts.fuel_consumption_percentiles
+        shown = np.sum(~np.isnan(data), axis=0) > 0
+        percentile_values = dict(zip(charts.world_percentiles, charts.nan_percentiles(data[:, shown],
+                                                                                      charts.world_percentiles)))
+        traces = charts.percentile_bands(np.asarray(years)[shown], percentile_values,
+                                         bands=[(10, 90), (25, 75)], fill_colors=['#f2f2f2', '#e6e6e6'],
+                                         line=background_line)
+    elif mode == 'batched':
+        traces = [charts.background_lines(data, line=background_line)]
+    else:
+        traces = charts.background_line_traces(data, line=background_line)
+    return charts.figure_spec(traces, {})
+
+
+def benchmark(data, mode, export):
+    fig, build_time = timed(build_figure, data, mode)
+    fig_json, json_time = timed(lambda: pio.to_json(fig, validate=False))
+    results = {
+        'traces': len(fig['data']),
+        'build (s)': build_time,
+        'to_json (s)': json_time,
+        'json size (kB)': len(fig_json) / 1000
+    }
+    if export:
+        image, export_time = timed(lambda: pio.to_image(fig, 'png', validate=False))
+        results['export (s)'] = export_time
+    return results
+
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--series', type=int, nargs='+', default=[53, 1000, 5000], help='Numbers of series to benchmark')
+parser.add_argument('--export', action='store_true', help='Also time static png export (slow for per-trace mode)')
+parser.add_argument('--modes', nargs='+', choices=['per-trace', 'batched', 'bands'],
+                    default=['per-trace', 'batched', 'bands'], help='Ways of drawing the series to benchmark')
+args = parser.parse_args()
+
+# Warm up plotly's validators and the image export process so the first measurement isn't skewed
+benchmark(synthetic_series(2), 'batched', args.export)
+
+for number_of_series in args.series:
+    series = synthetic_series(number_of_series)
+    for mode in args.modes:
+        # The bands are computed from the parsed matrix, the lines drawn from the series
+        data = series_matrix(series) if mode == 'bands' else series
+        results = benchmark(data, mode, args.export)
+        print('{:>6} series, {:<9}'.format(number_of_series, mode),
+              '  '.join('{}: {:.3f}'.format(name, value) if isinstance(value, float) else '{}: {}'.format(name, value)
+                        for name, value in results.items()))
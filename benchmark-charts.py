@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+'''
+    Benchmark of the three graph pipelines on synthetic data, from the current size up to 10k countries x 100 years
+
+    Synthetic GFEI-shaped (fuel consumption, CO2 emissions) and World Bank-shaped (pump prices) CSV files are generated
+    for each size, then every stage of every graph is timed separately:
+        parse      CSV parsing into Tables (datasets.parse_gfei, datasets.parse_world_bank, no cache)
+        organize   selection and organization of the data to plot (charts.*_plotting_data)
+        build      trace and layout construction (charts.*_figure), compared with building the same figure with
+                   plotly.graph_objs (go.Figure validating the figure spec)
+        json       JSON serialization of the figure, with typed arrays (as written by export.write_json)
+        export     static image export (through the render service if it is running)
+
+    Each stage is run --repeat times and the best time is kept. Results are written as JSON (by default to
+    benchmark-results/<commit>.json) and can be compared with the results of another commit:
+
+    Usage: python benchmark-charts.py [--sizes 53x13 1000x30 10000x100] [--repeat 3] [--no-export]
+           python benchmark-charts.py --compare benchmark-results/bb3ffbb.json
+'''
+
+from pathlib import Path
+import argparse
+import csv
+import json
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+# Installing plotly: https://plot.ly/python/getting-started/
+import plotly
+import plotly.graph_objs as go
+import plotly.io as pio
+
+import charts
+import countries
+import datasets
+import export
+import wdi
+
+results_directory = Path(__file__).resolve().parent / 'benchmark-results'
+
+# Countries the graphs highlight or label, which must be in the data (the others are synthetic)
+named_countries = ['Canada', 'United States', 'Germany', 'China', 'Malaysia', 'India', 'Portugal', 'Iceland',
+                   'Argentina']
+
+# Share of missing data points, as in the GFEI and World Bank files
+missing_share = 0.2
+
+
+def parse_size(size):
+    ''' "1000x30" -> (1000, 30) '''
+    number_of_countries, number_of_years = size.lower().split('x')
+    return int(number_of_countries), int(number_of_years)
+
+
+def synthetic_countries(number_of_countries):
+    ''' Country names and ISO-3 codes: the named countries first, with their real codes (see countries.aliases), then
+        "Country 0009" and so on, with 3-letter codes that aren't the code of any country of countries.aliases (so that
+        the tables are joined on the same rows whether they are joined on names or on codes)
+    '''
+    names = (named_countries + ['Country {:04d}'.format(i) for i in range(len(named_countries), number_of_countries)])
+    real_codes = set(countries.aliases.values())
+    synthetic_codes = (code for code in (''.join(chr(ord('A') + i // 26 ** k % 26) for k in (2, 1, 0))
+                                         for i in range(26 ** 3))
+                       if code not in real_codes)
+    codes = [countries.aliases[name] for name in named_countries] + \
+            [next(synthetic_codes) for name in names[len(named_countries):]]
+    return names[:number_of_countries], codes[:number_of_countries]
+
+
+def synthetic_values(rng, number_of_countries, number_of_years, low, high):
+    ''' Slowly decreasing series between low and high, with missing data points (NaN) '''
+    start = rng.uniform(low, high, size=(number_of_countries, 1))
+    values = start * np.linspace(1, 0.8, number_of_years) + rng.uniform(-0.02, 0.02, (number_of_countries, 1)) * start
+    values[rng.random(values.shape) < missing_share] = np.nan
+    return np.round(values, 1)
+
+
+def format_value(value):
+    return '' if np.isnan(value) else '{:g}'.format(value)
+
+
+def write_gfei_csv(filepath, title, unit, country_names, years, values):
+    ''' Writes a table in the layout of the GFEI files (title lines, header row of years, cp1252) '''
+    with open(filepath, 'w', encoding='cp1252', newline='') as file:
+        csv_writer = csv.writer(file)
+        csv_writer.writerow([title] + [''] * len(years))
+        csv_writer.writerow([unit] + [''] * len(years))
+        csv_writer.writerow([''] + [str(year) for year in years])
+        for country, row in zip(country_names, values):
+            csv_writer.writerow([country] + [format_value(value) for value in row])
+
+
+def write_synthetic_data(directory, number_of_countries, number_of_years, seed=0):
+    ''' Writes the three data files of a given size to directory, ending in 2017 like the real data '''
+    rng = np.random.default_rng(seed)
+    country_names, codes = synthetic_countries(number_of_countries)
+    years = list(range(2018 - number_of_years, 2018))
+
+    filepaths = {
+        'co2-emissions': directory / 'co2-emissions.csv',
+        'fuel-consumption': directory / 'fuel-consumption.csv',
+        'pump-prices': directory / 'pump-prices.csv'
+    }
+    write_gfei_csv(filepaths['co2-emissions'], 'Table C.2 - Average CO2 emissions', '(g CO2/km, WLTP)',
+                   country_names, years, synthetic_values(rng, number_of_countries, number_of_years, 110, 230))
+    write_gfei_csv(filepaths['fuel-consumption'], 'Table C.3 - Average fuel consumption', '(Lge/100 km, WLTP)',
+                   country_names, years, synthetic_values(rng, number_of_countries, number_of_years, 5, 11))
+    pump_prices = datasets.Table(synthetic_values(rng, number_of_countries, number_of_years, 0.3, 2),
+                                 country_names, years, country_codes=codes)
+    wdi.write_world_bank_csv(pump_prices, filepaths['pump-prices'], 'Pump price for gasoline (US$ per liter)',
+                             'EP.PMP.SGAS.CD')
+    return filepaths
+
+
+def highlighted_country(country_names):
+    ''' Canada, unless it has no data to plot (a share of the synthetic data points are missing): the first country '''
+    return 'Canada' if 'Canada' in country_names else country_names[0]
+
+
+def best_time(function, repeat):
+    ''' Result of function and its best run time over repeat runs '''
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def benchmark_graph(name, filepaths, repeat, pool):
+    ''' Times every stage of a graph, returns times (s) by stage and output sizes '''
+    parsers = {
+        'co2-emissions': datasets.parse_gfei,
+        'fuel-consumption': datasets.parse_gfei,
+        'pump-prices': datasets.parse_world_bank
+    }
+    table_names = charts.graphs[name]['tables']
+    tables, parse_time = best_time(lambda: {table: parsers[table](filepaths[table]) for table in table_names}, repeat)
+
+    if name == 'co2':
+        organize = lambda: charts.co2_emissions_plotting_data(tables['co2-emissions'])
+        build = lambda data: charts.co2_emissions_figure(tables['co2-emissions'], plotting_data=data,
+                                                         highlight=highlighted_country(data[0]))
+    elif name == 'lines':
+        organize = lambda: charts.fuel_consumption_plotting_data(tables['fuel-consumption'])
+        build = lambda data: charts.fuel_consumption_figure(tables['fuel-consumption'],
+                                                            tables['fuel-consumption'].countries, plotting_data=data,
+                                                            highlight=highlighted_country(
+                                                                [country for country, country_data in data.items()
+                                                                 if len(country_data['years'])]))
+    else:
+        organize = lambda: charts.consumption_vs_price_plotting_data(tables['fuel-consumption'],
+                                                                     tables['pump-prices'])
+        build = lambda data: charts.consumption_vs_price_figure(tables['fuel-consumption'], tables['pump-prices'],
+                                                                plotting_data=data,
+                                                                highlight=highlighted_country(data[0]))
+
+    plotting_data, organize_time = best_time(organize, repeat)
+    fig, build_time = best_time(lambda: build(plotting_data), repeat)
+    _, graph_objs_build_time = best_time(lambda: go.Figure(build(plotting_data)), repeat)
+    fig_json, json_time = best_time(lambda: pio.to_json(export.figure_spec(fig), validate=False), repeat)
+    plain_fig_json, plain_json_time = best_time(lambda: pio.to_json(fig, validate=False), repeat)
+    results = {
+        'stages (s)': {
+            'parse': parse_time,
+            'organize': organize_time,
+            'build': build_time,
+            'json': json_time
+        },
+        'graph_objs build (s)': graph_objs_build_time,
+        'plain json (s)': plain_json_time,
+        'json size (bytes)': len(fig_json),
+        'plain json size (bytes)': len(plain_fig_json)
+    }
+    if pool is not None:
+        image, results['stages (s)']['export'] = best_time(lambda: pool.render(fig, format='png'), repeat)
+        results['image size (bytes)'] = len(image)
+    results['total (s)'] = sum(results['stages (s)'].values())
+    return results
+
+
+def current_commit():
+    ''' Short hash of the checked out commit, with a "+" if the working tree has changes ('unknown' outside of git) '''
+    directory = Path(__file__).resolve().parent
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directory, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        changes = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('+' if changes else '')
+
+
+def print_results(results, reference=None):
+    ''' Prints stage times, and ratios to the reference results (e.g. of a previous commit) when given '''
+    for size, graphs in results['sizes'].items():
+        for name, graph_results in graphs.items():
+            line = []
+            for stage, stage_time in graph_results['stages (s)'].items():
+                cell = '{}: {:.3f}'.format(stage, stage_time)
+                try:
+                    reference_time = reference['sizes'][size][name]['stages (s)'][stage]
+                    cell += ' ({:.2f}x)'.format(stage_time / reference_time)
+                except (KeyError, TypeError, ZeroDivisionError):
+                    pass
+                line.append(cell)
+            if 'graph_objs build (s)' in graph_results:
+                line.append('[graph_objs build: {:.3f}]'.format(graph_results['graph_objs build (s)']))
+            print('{:>10} {:<8}'.format(size, name), '  '.join(line))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['53x13', '1000x30', '10000x100'],
+                        help='Data sizes as <countries>x<years>')
+    parser.add_argument('--only', nargs='+', choices=list(charts.graphs), help='Graphs to benchmark (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each stage (the best time is kept)')
+    parser.add_argument('--no-export', action='store_true', help="Don't time image export")
+    parser.add_argument('--output', type=Path, help='Results file (default: benchmark-results/<commit>.json)')
+    parser.add_argument('--compare', type=Path, help='Results file of a previous run to compare with')
+    args = parser.parse_args()
+
+    commit = current_commit()
+    results = {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'machine': platform.platform(),
+        'repeat': args.repeat,
+        'sizes': {}
+    }
+
+    # Warm up plotly's validators (and the export engine) so the first measurements aren't skewed
+    warm_up_figure = charts.graphs['co2']['figure'](datasets.load(['co2-emissions']))
+    go.Figure(warm_up_figure)
+    pio.to_json(warm_up_figure, validate=False)
+    pool = None if args.no_export else export.render_pool(size=1)
+    try:
+        if pool is not None:
+            pool.render(warm_up_figure, format='png')
+
+        with tempfile.TemporaryDirectory() as directory:
+            for size in args.sizes:
+                number_of_countries, number_of_years = parse_size(size)
+                size_directory = Path(directory) / size
+                size_directory.mkdir()
+                filepaths = write_synthetic_data(size_directory, number_of_countries, number_of_years)
+                results['sizes'][size] = {name: benchmark_graph(name, filepaths, args.repeat, pool)
+                                          for name in args.only or charts.graphs}
+                print_results({'sizes': {size: results['sizes'][size]}})
+    finally:
+        if pool is not None:
+            pool.close()
+
+    output_filepath = args.output or results_directory / '{}.json'.format(commit)
+    output_filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_filepath, 'w') as file:
+        json.dump(results, file, indent=2)
+    print('Wrote', output_filepath)
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as file:
+            reference = json.load(file)
+        print('Compared with {} ({}):'.format(reference['commit'], args.compare))
+        print_results(results, reference)
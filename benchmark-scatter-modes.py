@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+'''
+    Benchmark of the ways of drawing the points of the fuel consumption vs price scatter (see charts.scatter_modes):
+    SVG markers, WebGL markers and the density heatmap, from the current 50 countries to a million points
+
+    Times figure construction, JSON serialization (with typed arrays, as written by export.write_json) and
+    (optionally) static image export for synthetic points following the trend of the real data, and prints the mode
+    picked automatically for each number of points.
+
+    Usage: python benchmark-scatter-modes.py [--points 50 1000 100000 1000000] [--export]
+           python benchmark-scatter-modes.py --points 10000 --modes svg webgl --export
+'''
+
+import argparse
+import time
+
+import numpy as np
+
+# Installing plotly: https://plot.ly/python/getting-started/
+import plotly.io as pio
+
+import charts
+import export
+
+# Points labelled by the graph, which must be in the data (the others are synthetic)
+named_countries = ['Canada', 'United States', 'Malaysia', 'India', 'Germany', 'Portugal', 'Iceland', 'Argentina']
+
+
+def synthetic_points(number_of_points, seed=0):
+    ''' Names, fuel consumptions and pump prices of points around the trend of the 2016 data (see regression.py),
+        as returned by charts.consumption_vs_price_plotting_data
+    '''
+    rng = np.random.default_rng(seed)
+    number_of_points = max(number_of_points, len(named_countries))
+    names = named_countries + ['Point {}'.format(i) for i in range(len(named_countries), number_of_points)]
+    pump_prices = np.round(rng.uniform(0.3, 2, number_of_points), 2)
+    fuel_consumptions = np.round(np.exp(2.37 - 0.46 * pump_prices + rng.normal(0, 0.1, number_of_points)), 1)
+    return names, fuel_consumptions, pump_prices
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def build_figure(plotting_data, mode):
+    return charts.consumption_vs_price_figure(None, None, plotting_data=plotting_data, mode=mode)
+
+
+def benchmark(plotting_data, mode, export_images):
+    fig, build_time = timed(build_figure, plotting_data, mode)
+    fig_json, json_time = timed(lambda: pio.to_json(export.figure_spec(fig), validate=False))
+    results = {
+        'build (s)': build_time,
+        'to_json (s)': json_time,
+        'json size (kB)': len(fig_json) / 1000
+    }
+    if export_images:
+        image, export_time = timed(lambda: pio.to_image(fig, 'png', validate=False))
+        results['export (s)'] = export_time
+    return results
+
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--points', type=int, nargs='+', default=[50, 1000, 10000, 100000, 1000000],
+                    help='Numbers of points to benchmark')
+parser.add_argument('--export', action='store_true', help='Also time static png export (slow for many SVG markers)')
+parser.add_argument('--modes', nargs='+', choices=charts.scatter_modes, default=charts.scatter_modes,
+                    help='Ways of drawing the points to benchmark')
+args = parser.parse_args()
+
+# Warm up plotly and the image export process so the first measurement isn't skewed
+for mode in args.modes:
+    benchmark(synthetic_points(50), mode, args.export)
+
+for number_of_points in args.points:
+    plotting_data = synthetic_points(number_of_points)
+    print('{:>8} points (auto: {})'.format(number_of_points, charts.scatter_mode(number_of_points)))
+    for mode in args.modes:
+        results = benchmark(plotting_data, mode, args.export)
+        print('          {:<8}'.format(mode), '  '.join('{}: {:.3f}'.format(name, value)
+                                                       for name, value in results.items()))
@@ -0,0 +1,114 @@
+'''
+    Incremental builds of the graphs (see render-graphs.py)
+
+    Each graph output (e.g. graphs/avg-fuel-consumption-canada.png) depends on the data files of its tables, on the
+    other files it is drawn from (e.g. country-list.txt, see charts.graphs) and on the code drawing it. A manifest in
+    cache/ records the content hash of every input of every output when it is built, along with the options it was
+    built with and the hash of the output itself. An output is built again only if one of its inputs changed, if it was
+    built with other options, or if it was deleted or modified since.
+
+    Files are only hashed again when their modification time or size changed (like the data cache of datasets.py).
+'''
+
+from pathlib import Path
+import json
+
+import datasets
+import render_cache
+
+root_directory = Path(__file__).resolve().parent
+manifest_filepath = root_directory / 'cache' / 'build-manifest.json'
+
+# Code drawing the graphs, which every graph depends on: the figure builders (charts.py and the modules of the repository
+# it imports, and regression.py, whose trends the scatter draws) and the export code
+code_filepaths = [root_directory / filename for filename in
+                  ['charts.py', 'colormap.py', 'countries.py', 'datasets.py', 'export.py', 'profiling.py',
+                   'regression.py', 'render_cache.py', 'renderer.py', 'typed_arrays.py']]
+
+# Bump when the manifest format changes to rebuild everything
+manifest_format_version = 1
+
+
+def graph_inputs(graph):
+    ''' Files a graph of charts.graphs is drawn from '''
+    return [datasets.filepaths[table] for table in graph['tables']] + list(graph.get('inputs', [])) + code_filepaths
+
+
+def output_options(format, year=None):
+    ''' Options an output is built with: another format, year or export engine makes it another output '''
+    return {'format': format, 'year': year, 'engine': render_cache.engine_versions()}
+
+
+def relative_path(filepath):
+    ''' Path relative to the repository (as recorded in the manifest) '''
+    filepath = Path(filepath).resolve()
+    try:
+        return filepath.relative_to(root_directory).as_posix()
+    except ValueError:
+        return filepath.as_posix()
+
+
+class Manifest:
+    ''' Content hashes of the inputs and outputs of the last build of every output '''
+
+    def __init__(self, filepath=manifest_filepath):
+        self.filepath = filepath
+        try:
+            with open(filepath, 'r') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is None or manifest.get('version') != manifest_format_version:
+            manifest = {'version': manifest_format_version, 'files': {}, 'outputs': {}}
+        self.files = manifest['files']  # Hashes of files by path, with the modification time and size they're for
+        self.outputs = manifest['outputs']
+
+    def file_hash(self, filepath):
+        ''' SHA-256 of a file (None if it doesn't exist), only computed again if the file was touched '''
+        path = relative_path(filepath)
+        try:
+            stat = Path(filepath).stat()
+        except FileNotFoundError:
+            return None
+        known = self.files.get(path)
+        if known is None or known['mtime-ns'] != stat.st_mtime_ns or known['size'] != stat.st_size:
+            known = {'mtime-ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': datasets.file_hash(filepath)}
+            self.files[path] = known
+        return known['sha256']
+
+    def changes(self, output_filepath, input_filepaths, options):
+        ''' Reasons to build an output again (none if it is up to date) '''
+        built = self.outputs.get(relative_path(output_filepath))
+        if built is None:
+            return ['never built']
+        output_hash = self.file_hash(output_filepath)
+        if output_hash is None:
+            return ['deleted']
+        if output_hash != built['sha256']:
+            return ['modified since it was built']
+
+        reasons = []
+        if built['options'] != options:
+            reasons.append('built with other options')
+        input_hashes = {relative_path(filepath): self.file_hash(filepath) for filepath in input_filepaths}
+        for path, input_hash in input_hashes.items():
+            if path not in built['inputs']:
+                reasons.append('new input ' + path)
+            elif input_hash is None:
+                reasons.append(path + ' missing')
+            elif input_hash != built['inputs'][path]:
+                reasons.append(path + ' changed')
+        return reasons
+
+    def record(self, output_filepath, input_filepaths, options):
+        ''' Records a built output with the hashes of its inputs '''
+        self.outputs[relative_path(output_filepath)] = {
+            'sha256': self.file_hash(output_filepath),
+            'inputs': {relative_path(filepath): self.file_hash(filepath) for filepath in input_filepaths},
+            'options': options
+        }
+
+    def save(self):
+        self.filepath.parent.mkdir(exist_ok=True)
+        manifest = {'version': manifest_format_version, 'files': self.files, 'outputs': self.outputs}
+        datasets.write_atomically(self.filepath, lambda file: file.write(json.dumps(manifest, indent=1).encode()))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+'''
+    Local HTTP service drawing the graphs on demand, with parameters (see chart_server.py)
+
+    The data is loaded once and images are rendered by a pool of warm workers (those of the render service if it is
+    running, see render-service.py). Open http://localhost:8050/ for the graphs, formats and options it serves.
+
+    Usage: python chart-service.py [--port 8050] [--workers 2] [--cache-size 64]
+           curl 'http://localhost:8050/scatter.png?year=2012&highlight=Germany'
+           curl 'http://localhost:8050/lines.svg?highlight=United%20States&width=1000&height=600'
+           curl 'http://localhost:8050/co2.html?highlight=France'
+           curl 'http://localhost:8050/health'   # Cache and request statistics
+'''
+
+import argparse
+import asyncio
+import signal
+
+import chart_server
+import charts
+import datasets
+import export
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='localhost', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int, default=2, help='Number of render workers')
+    parser.add_argument('--cache-size', type=float, default=64, help='Size of the in-memory response cache (MB)')
+    args = parser.parse_args()
+
+    # Shut down cleanly when stopped with kill as well as with Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    tables = datasets.load(sorted({table for graph in charts.graphs.values() for table in graph['tables']}))
+    with export.render_pool(size=args.workers) as pool:
+        service = chart_server.ChartService(tables, pool, max_cache_size=int(args.cache_size * 2 ** 20))
+        print('Chart service ready on http://{}:{}/'.format(args.host, args.port), flush=True)
+        try:
+            asyncio.run(chart_server.serve(service, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,300 @@
+'''
+    HTTP service drawing the graphs on demand (see chart-service.py)
+
+    GET /<graph>.<format>?<options> draws a graph of charts.graphs from the data loaded at startup, e.g.
+    /scatter.png?year=2012&highlight=Germany&width=1200&scale=2. Options: year (graphs drawn by year), highlight (a
+    country) and, for images, width, height and scale. Images are rendered by a pool of warm workers (see renderer.py),
+    and reused from the render cache when they were rendered before (see render_cache.py).
+
+    Responses are kept in memory, the least recently used ones dropped past max_cache_size bytes, and carry an ETag (a
+    hash of the body): a request whose If-None-Match matches it gets a 304 Not Modified without the body. Identical
+    requests arriving while a graph is being drawn wait for it rather than drawing it again.
+
+    The HTTP server is a minimal HTTP/1.1 implementation over asyncio streams (GET and HEAD, keep-alive connections),
+    enough for browsers and local tools without another dependency. It is meant to listen on localhost, or behind a
+    reverse proxy.
+'''
+
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+import asyncio
+import hashlib
+import json
+
+import charts
+import export
+import render_cache
+import renderer
+
+image_formats = ['png', 'jpeg', 'webp', 'svg', 'pdf']
+content_types = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+    'json': 'application/json',
+    'html': 'text/html; charset=utf-8'
+}
+
+# Largest width and height (pixels) and scale of the images
+max_dimension = 4000
+max_scale = 4
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Response:
+    ''' Body of a drawn graph with its content type and ETag '''
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+
+
+class ResponseCache:
+    ''' Responses by request key, the least recently used dropped when their bodies add up to over max_size bytes '''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.responses = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        response = self.responses.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.responses.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        if len(response.body) > self.max_size:
+            return
+        if key in self.responses:
+            self.size -= len(self.responses.pop(key).body)
+        self.responses[key] = response
+        self.size += len(response.body)
+        while self.size > self.max_size:
+            oldest_key, oldest_response = self.responses.popitem(last=False)
+            self.size -= len(oldest_response.body)
+
+
+def parse_number(option, value, parse, low=None, high=None):
+    ''' Value of a numeric option (parse: int or float), checked to be between low and high if they are given '''
+    try:
+        value = parse(value)
+    except ValueError:
+        raise HTTPError(400, '{} must be a number'.format(option))
+    if low is not None and not low <= value <= high:
+        raise HTTPError(400, '{} must be between {} and {}'.format(option, low, high))
+    return value
+
+
+class ChartService:
+    ''' Draws the graphs of requests from tables (see datasets.load), rendering images with pool (see renderer.py) '''
+
+    def __init__(self, tables, pool, max_cache_size=64 * 2 ** 20):
+        self.tables = tables
+        self.pool = pool
+        self.cache = ResponseCache(max_cache_size)
+        self.drawing = {}  # Tasks drawing the responses of request keys
+        self.coalesced = 0
+        self.years = {name: graph['years'](tables) for name, graph in charts.graphs.items() if 'years' in graph}
+
+    def request_key(self, name, format, query):
+        ''' Graph name, format and options (sorted (option, value) pairs) of a request, checked '''
+        if name not in charts.graphs:
+            raise HTTPError(404, 'No graph named {} (graphs: {})'.format(name, ', '.join(charts.graphs)))
+        if format not in content_types:
+            raise HTTPError(404, 'No {} format (formats: {})'.format(format, ', '.join(content_types)))
+
+        allowed_options = ['highlight'] + (['year'] if name in self.years else [])
+        if format in image_formats:
+            allowed_options += ['width', 'height', 'scale']
+        options = {}
+        for option, value in parse_qsl(query, keep_blank_values=True):
+            if option not in allowed_options:
+                raise HTTPError(400, 'Unknown option {} (options of {}.{}: {})'.format(
+                    option, name, format, ', '.join(allowed_options)))
+            if option in options:
+                raise HTTPError(400, 'Option {} given more than once'.format(option))
+            if option == 'year':
+                value = parse_number(option, value, int)
+                if value not in self.years[name]:
+                    raise HTTPError(400, 'No data to draw {} for {} (years: {})'.format(name, value, self.years[name]))
+            elif option == 'highlight':
+                value = value.strip()
+            elif option in ('width', 'height'):
+                value = parse_number(option, value, int, 10, max_dimension)
+            elif option == 'scale':
+                value = parse_number(option, value, float, 0.1, max_scale)
+            options[option] = value
+        return name, format, tuple(sorted(options.items()))
+
+    async def response(self, key):
+        ''' Response of a request key: cached, being drawn for another request, or drawn now '''
+        response = self.cache.get(key)
+        if response is not None:
+            return response
+        task = self.drawing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.draw(key))
+            self.drawing[key] = task
+            task.add_done_callback(lambda task: self.drawn(key, task))
+        else:
+            self.coalesced += 1
+        # A client disconnecting doesn't cancel the drawing, which other requests may be waiting for
+        return await asyncio.shield(task)
+
+    def drawn(self, key, task):
+        del self.drawing[key]
+        if not task.cancelled() and task.exception() is None:
+            self.cache.put(key, task.result())
+
+    async def draw(self, key):
+        name, format, options = key
+        options = dict(options)
+        figure_options = {option: options.pop(option) for option in ('year', 'highlight') if option in options}
+        loop = asyncio.get_running_loop()
+
+        # Figures are built in a thread, not to hold up other requests
+        try:
+            fig = await loop.run_in_executor(None, lambda: charts.graphs[name]['figure'](self.tables, **figure_options))
+        except ValueError as error:
+            raise HTTPError(400, str(error))  # e.g. no data for the highlighted country
+
+        if format == 'json':
+            body = (await loop.run_in_executor(None, export.to_json, fig)).encode()
+        elif format == 'html':
+            body = (await loop.run_in_executor(None, export.to_html, fig, None, 'cdn')).encode()
+        else:
+            body = await self.render(fig, format, **options)
+        return Response(body, content_types[format])
+
+    async def render(self, fig, format, width=None, height=None, scale=None):
+        ''' Image of a figure, from the render cache or rendered by the pool '''
+        loop = asyncio.get_running_loop()
+        key = None
+        if export.use_render_cache:
+            key = await loop.run_in_executor(None, lambda: render_cache.key(renderer.figure_dict(fig), format,
+                                                                            width, height, scale))
+            image = await loop.run_in_executor(None, render_cache.read, key, format)
+            if image is not None:
+                return image
+
+        image = await asyncio.wrap_future(self.pool.submit(fig, format=format, width=width, height=height, scale=scale))
+        if key is not None:
+            await loop.run_in_executor(None, render_cache.store, key, format, image)
+        return image
+
+    def index(self):
+        ''' Graphs, formats and options that can be requested '''
+        return {
+            'graphs': {name: {'years': self.years.get(name), 'filename': graph['filename']}
+                       for name, graph in charts.graphs.items()},
+            'formats': list(content_types),
+            'options': ['year', 'highlight', 'width', 'height', 'scale'],
+            'example': '/scatter.png?year=2012&highlight=Germany&width=1200'
+        }
+
+    def stats(self):
+        return {
+            'cached responses': len(self.cache.responses),
+            'cache size (bytes)': self.cache.size,
+            'cache hits': self.cache.hits,
+            'cache misses': self.cache.misses,
+            'coalesced requests': self.coalesced,
+            'drawing': len(self.drawing)
+        }
+
+    async def handle_request(self, method, target, headers):
+        ''' Status, headers and body of the response to a request '''
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD', 'Content-Type': 'text/plain'}, b'Only GET and HEAD are supported\n'
+
+        url = urlsplit(target)
+        path = unquote(url.path)
+        if path in ('/', '/health'):
+            body = json.dumps(self.index() if path == '/' else self.stats(), indent=1).encode()
+            return 200, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}, body
+
+        name, dot, format = path[1:].rpartition('.')
+        try:
+            if not dot:
+                name, format = path[1:], ''
+            response = await self.response(self.request_key(name, format, url.query))
+        except HTTPError as error:
+            return error.status, {'Content-Type': 'text/plain'}, '{}\n'.format(error).encode()
+        except Exception as error:
+            return 500, {'Content-Type': 'text/plain'}, '{}: {}\n'.format(type(error).__name__, error).encode()
+
+        # Clients keep the response, and check that it is still the same on their next request
+        response_headers = {'Content-Type': response.content_type, 'ETag': response.etag, 'Cache-Control': 'no-cache'}
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None and (if_none_match.strip() == '*' or response.etag in
+                                          [etag.strip().removeprefix('W/') for etag in if_none_match.split(',')]):
+            return 304, response_headers, b''
+        return 200, response_headers, response.body
+
+    async def handle_connection(self, reader, writer):
+        ''' Answers the requests of an HTTP/1.1 connection until the client closes it '''
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.write_response(writer, 400, {'Content-Type': 'text/plain'}, b'Bad request line\n', False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    header, _, value = line.decode('latin-1').partition(':')
+                    headers[header.strip().lower()] = value.strip()
+
+                # Request bodies aren't read: a connection with one isn't reused
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                              and headers.get('content-length', '0') == '0' and 'transfer-encoding' not in headers)
+                status, response_headers, body = await self.handle_request(method, target, headers)
+                await self.write_response(writer, status, response_headers, body if method != 'HEAD' else None,
+                                          keep_alive, content_length=len(body))
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass  # Client gone, or a line over the stream limit
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def write_response(writer, status, headers, body, keep_alive, content_length=None):
+        lines = ['HTTP/1.1 {} {}'.format(status, HTTPStatus(status).phrase)]
+        headers = dict(headers)
+        if status != 304:
+            headers['Content-Length'] = str(content_length if content_length is not None else len(body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        lines += ['{}: {}'.format(header, value) for header, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if body and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+
+async def serve(service, host='localhost', port=8050):
+    ''' Serves the requests of HTTP clients with service (a ChartService) until cancelled '''
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,887 @@
+'''
+    Figures of the three graphs and the plotting helpers they share
+
+    Figures are built as plain dictionaries (figure specs) rather than with plotly.graph_objs, whose objects validate
+    every property when it is set, which made validation the main cost of building figures with many traces. The specs
+    are checked against plotly's schema by check-figures.py instead of on every run. They can be exported as they are
+    (see export.py), or turned into a go.Figure with go.Figure(spec) to be edited or shown interactively.
+'''
+
+from pathlib import Path
+import warnings
+
+import numpy as np
+
+import colormap
+import countries
+import profiling
+
+country_list_filepath = Path(__file__).resolve().parent / 'country-list.txt'
+
+
+def template():
+    ''' Plotly's default template (plotly_white, ...) as a dictionary, which go.Figure would otherwise add '''
+    # Plotly is only imported once a figure is built: importing it is slower than loading the data
+    # Installing plotly: https://plot.ly/python/getting-started/
+    import plotly.io as pio
+
+    if pio.templates.default is None:
+        return {}
+    return pio.templates[pio.templates.default].to_plotly_json()
+
+
+def figure_spec(data, layout):
+    ''' Figure dictionary of traces and a layout (both plain dictionaries), styled with the default template '''
+    layout = dict(layout)
+    layout.setdefault('template', template())
+    return {'data': data, 'layout': layout}
+
+
+def background_lines(series, line):
+    ''' Packs many de-emphasized (x, y) series into a single line trace
+
+        Series are separated by a NaN gap so plotly breaks the line between countries instead of
+        joining them. The result is validated, serialized and drawn as one SVG path no matter how
+        many series it holds.
+    '''
+    # Gap separator after each series
+    gap = np.array([np.nan])
+    x = np.concatenate([part for series_x, series_y in series for part in (series_x, gap)] or [gap[:0]])
+    y = np.concatenate([part for series_x, series_y in series for part in (series_y, gap)] or [gap[:0]])
+
+    return dict(
+        type='scatter',
+        x=x,
+        y=y,
+        mode='lines',
+        connectgaps=False,
+        line=line
+    )
+
+
+def background_line_traces(series, line):
+    ''' Draws each de-emphasized (x, y) series as its own line trace (one trace per country) '''
+    return [dict(type='scatter', x=series_x, y=series_y, mode='lines', line=line) for series_x, series_y in series]
+
+
+def nan_percentiles(values, percentiles):
+    ''' Percentiles of each column of a 2D array, ignoring NaN (missing) values, e.g. of every year of a country x year
+        matrix: one row per percentile, NaN for the columns without values
+
+        Same as np.nanpercentile (linear interpolation), computed for every column at once from a sort of the matrix.
+    '''
+    values = np.sort(values, axis=0)  # NaN sorted last
+    counts = np.sum(~np.isnan(values), axis=0)
+    # Fractional positions of the percentiles among the values of each column
+    positions = np.outer(np.asarray(percentiles, dtype=float) / 100, np.maximum(counts - 1, 0))
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    lower_values = np.take_along_axis(values, lower, axis=0)
+    upper_values = np.take_along_axis(values, upper, axis=0)
+    result = lower_values + (upper_values - lower_values) * (positions - lower)
+    result[:, counts == 0] = np.nan
+    return result
+
+
+def percentile_bands(x, percentile_values, bands, fill_colors, line):
+    ''' Filled bands between percentiles of many series and a line for their median (percentile_values: values of
+        each percentile, see nan_percentiles), drawn as a few traces whatever the number of series
+
+        bands: (lower, upper) percentiles of each band, widest first, filled with fill_colors
+    '''
+    traces = []
+    for (lower, upper), fill_color in zip(bands, fill_colors):
+        # The upper edge of a band is filled down to the trace before it, its lower edge
+        edge = dict(type='scatter', x=x, mode='lines', line=dict(width=0), hoverinfo='skip')
+        traces.append(dict(edge, y=percentile_values[lower]))
+        traces.append(dict(edge, y=percentile_values[upper], fill='tonexty', fillcolor=fill_color))
+    traces.append(dict(type='scatter', x=x, y=percentile_values[50], mode='lines', line=line, hoverinfo='skip'))
+    return traces
+
+
+def trend_traces(trend, line_color, fill_color):
+    ''' Confidence band (if the trend has one) and fitted curve of a trend (see regression.trend) '''
+    traces = []
+    if trend['lower'] is not None:
+        band_edge = dict(type='scatter', x=trend['x'], mode='lines', line=dict(width=0), hoverinfo='skip')
+        traces += [
+            dict(band_edge, y=trend['lower']),
+            dict(band_edge, y=trend['upper'], fill='tonexty', fillcolor=fill_color)
+        ]
+    return traces + [dict(type='scatter', x=trend['x'], y=trend['y'], mode='lines',
+                          line=dict(width=1.5, color=line_color), hoverinfo='skip')]
+
+
+def ordinal(n):
+    ''' e.g. 1st, 2nd, 3rd, 4th, 11th, 21st '''
+    suffix = 'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return '{}{}'.format(n, suffix)
+
+
+def spread(values, min_gap):
+    ''' Values moved apart as little as possible, keeping their order, so that they are at least min_gap apart (e.g.
+        positions of labels that would overlap)
+    '''
+    # Groups of values too close to each other (first sorted index, original values), centered on their mean
+    groups = []
+    for i in np.argsort(values, kind='stable'):
+        groups.append([[i], [values[i]]])
+        while len(groups) > 1:
+            (indices, group_values), (next_indices, next_values) = groups[-2], groups[-1]
+            top = np.mean(group_values) + (len(group_values) - 1) / 2 * min_gap
+            bottom = np.mean(next_values) - (len(next_values) - 1) / 2 * min_gap
+            if bottom - top >= min_gap:
+                break
+            groups[-2:] = [[indices + next_indices, group_values + next_values]]
+    spread_values = [None] * len(values)
+    for indices, group_values in groups:
+        for position, i in enumerate(indices):
+            spread_values[i] = float(np.mean(group_values) + (position - (len(indices) - 1) / 2) * min_gap)
+    return spread_values
+
+
+def caption(text, line, color):
+    ''' Note under the bottom left of the plot, on line (0 for the first line) of the notes '''
+    return dict(
+        text=text,
+        font=dict(
+            size=11,
+            color=color,
+        ),
+        showarrow=False,
+        x=0,
+        y=-0.15 - 0.06 * line,
+        xref='paper',
+        yref='paper',
+        xanchor='left'
+    )
+
+
+def read_country_list(filepath):
+    ''' Reads country names, one per line (e.g. country-list.txt) '''
+    with open(filepath, 'r') as file:
+        return [line.strip() for line in file if line.strip() != '']
+
+
+@profiling.timed('organize')
+def co2_emissions_plotting_data(co2_emissions, year=2017):
+    ''' Country names and their CO2 emissions in a year (2017 by default), sorted by emissions '''
+    # Select and organize data
+    avg_car_co2_emissions = {}
+    for country_name, average_emissions in zip(co2_emissions.countries, co2_emissions.column(year)):
+        # Skip missing data points
+        if np.isnan(average_emissions):
+            continue
+
+        #print(country_name, average_emissions)
+        avg_car_co2_emissions[country_name] = average_emissions
+    #print(avg_car_co2_emissions)
+
+    # Sort countries as a function of their emissions
+    sorted_country_emissions = sorted(avg_car_co2_emissions.items(), key=lambda country: country[1])
+    #print('sorted_country_emissions:', len(sorted_country_emissions), sorted_country_emissions)
+
+    # Organize data into layers for plotting
+    country_names = []
+    avg_car_co2_emissions = []
+    for country_data in sorted_country_emissions:
+        country_name = country_data[0]
+        country_names.append(country_name)
+        avg_car_co2_emissions.append(country_data[1])
+    #print(country_names)
+    #print(avg_car_co2_emissions)
+    return country_names, avg_car_co2_emissions
+
+
+def co2_emissions_years(co2_emissions):
+    ''' Years for which at least one country has CO2 emissions '''
+    return [year for year in co2_emissions.years if not np.all(np.isnan(co2_emissions.column(year)))]
+
+
+@profiling.timed('build')
+def co2_emissions_figure(co2_emissions, plotting_data=None, highlight='Canada', skeleton=None, year=2017):
+    ''' Bar chart of average CO2 emissions per km by country in a year (2017 by default), highlight (Canada by default)
+        in dark red
+
+        plotting_data: result of co2_emissions_plotting_data for year (computed from co2_emissions if not given)
+        skeleton: result of co2_emissions_skeleton (built from plotting_data if not given), to draw the graph with
+                  several highlighted countries
+    '''
+    if plotting_data is None:
+        plotting_data = co2_emissions_plotting_data(co2_emissions, year)
+    if skeleton is None:
+        skeleton = co2_emissions_skeleton(plotting_data)
+    return highlight_co2_emissions(skeleton, plotting_data, highlight, year)
+
+
+def highlight_co2_emissions(skeleton, plotting_data, highlight, year=2017):
+    ''' CO2 emissions figure of a skeleton with a highlighted country: only the bar colors and the title are new, the
+        rest of the figure is shared with the skeleton
+    '''
+    country_names, avg_car_co2_emissions = plotting_data
+    if highlight not in country_names:
+        raise ValueError('No {} CO2 emissions for {}'.format(year, highlight))
+    # Rank of the highlighted country from the closest end (countries are sorted by increasing emissions)
+    emissions_rank = len(country_names) - country_names.index(highlight)
+    if emissions_rank <= len(country_names) // 2:
+        emissions_rank_text = (ordinal(emissions_rank) + ' ' if emissions_rank > 1 else '') + 'highest'
+    else:
+        lowest_rank = country_names.index(highlight) + 1
+        emissions_rank_text = (ordinal(lowest_rank) + ' ' if lowest_rank > 1 else '') + 'lowest'
+
+    bars, = skeleton['data']
+    bar_colors = list(bars['marker']['color'])
+    bar_colors[country_names.index(highlight)] = '#600000'  # Dark red for the highlighted country
+    layout = skeleton['layout']
+    title_text = 'Cars in {} have the {} emissions in {}'.format(highlight, emissions_rank_text, year)
+    return {
+        'data': [dict(bars, marker=dict(bars['marker'], color=bar_colors))],
+        'layout': dict(layout, title=dict(layout['title'], text=title_text))
+    }
+
+
+@profiling.timed('build')
+def co2_emissions_skeleton(plotting_data):
+    ''' CO2 emissions figure without a highlighted country or title (see highlight_co2_emissions) '''
+    country_names, avg_car_co2_emissions = plotting_data
+
+    # Color bars with a gradient (yellow, orange, red) based on their value
+    gradient = colormap.Colormap([
+        (254, 217, 118),  # yellow
+        (253, 141, 60),  # orange
+        (177, 0, 0)  # red
+    ])
+    smallest_bar_value = avg_car_co2_emissions[0]
+    # 200 is a round number that is higher than the second highest bar (values above it get the darkest red)
+    bar_colors = gradient(avg_car_co2_emissions, vmin=smallest_bar_value, vmax=200).tolist()
+    #print('bar_colors:', len(bar_colors), bar_colors)
+
+    # Plot data
+    data = [dict(
+        type='bar',
+        x=np.asarray(avg_car_co2_emissions),
+        y=country_names,
+        orientation='h',
+        marker=dict(
+            color=bar_colors
+        )
+    )]
+
+    grey_palette = ['#f7f7f7', '#d9d9d9', '#bdbdbd', '#969696', '#737373', '#525252', '#252525']
+    layout = dict(
+        autosize=False,
+        width=800,
+        height=1000,
+        margin=dict(
+            l=150,
+            r=50,
+            b=100,
+            t=110,
+            pad=4
+        ),
+        font=dict(
+            family='Akzidenz-Grotesk BQ'  # Can be replaced with any font installed on computer
+        ),
+        plot_bgcolor='#ffffff',
+        title=dict(
+            text='',  # Set by highlight_co2_emissions
+            xref='paper',
+            x=0,
+            font=dict(
+                size=18,
+                color=grey_palette[5]
+            )
+        ),
+        annotations=[dict(
+            text="Average grams of CO₂ emitted per kilometer driven (g CO₂ / km)",
+            font=dict(
+                size=13,
+                color=grey_palette[2],
+            ),
+            showarrow=False,
+            x=0,
+            y=1.06,
+            xref='paper',
+            yref='paper',
+        )],
+        xaxis=dict(
+            zeroline=False,
+            side='top',
+            tickfont=dict(
+                color=grey_palette[2]
+            )
+        ),
+        yaxis=dict(
+            tickfont=dict(
+                color=grey_palette[3]
+            )
+        )
+    )
+
+    return figure_spec(data, layout)
+
+
+# Percentiles of the fuel consumptions of the world drawn by the summary of the fuel consumption graph: 80% and 50% of
+# the countries are in the two bands, around the median
+world_percentiles = (10, 25, 50, 75, 90)
+
+
+@profiling.timed('organize')
+def fuel_consumption_plotting_data(avg_fuel_consumption, country_names=None):
+    ''' Years and fuel consumptions of country_names (default: every country), skipping missing data points, and
+        which of them are interpolated if the gaps of the table are filled (see datasets.load)
+    '''
+    plotting_data = {}
+    for country in avg_fuel_consumption.countries if country_names is None else country_names:
+        if country not in avg_fuel_consumption.country_index:
+            continue
+        country_years, country_fuel_consumption = avg_fuel_consumption.series(country)
+        plotting_data[country] = {'years': country_years, 'fuel-consumption': country_fuel_consumption}
+        if avg_fuel_consumption.imputed is not None:
+            # Interpolated data points (see datasets.interpolate), drawn differently
+            plotting_data[country]['imputed'] = avg_fuel_consumption.imputed_series(country)
+    #print(plotting_data)
+    return plotting_data
+
+
+@profiling.timed('organize')
+def fuel_consumption_percentiles(avg_fuel_consumption, country_names=None, percentiles=world_percentiles,
+                                 min_countries=5):
+    ''' Years with fuel consumptions for at least min_countries of country_names (default: every country), and the
+        percentiles of their fuel consumptions in each of these years (by percentile, see nan_percentiles)
+    '''
+    values = avg_fuel_consumption.values
+    if country_names is not None:
+        values = values[[avg_fuel_consumption.country_index[country] for country in country_names
+                         if country in avg_fuel_consumption.country_index]]
+    shown = np.sum(~np.isnan(values), axis=0) >= min_countries
+    percentile_values = nan_percentiles(values[:, shown], percentiles)
+    return np.asarray(avg_fuel_consumption.years)[shown], dict(zip(percentiles, percentile_values))
+
+
+# Countries the highlighted country is compared to on the fuel consumption graph, in drawing order (last is drawn on
+# top), and the styles of the lines (scatter trace properties, with a marker, whose color is that of the label for the
+# highlighted country)
+fuel_consumption_comparison_countries = ('United States', 'Germany', 'China')
+comparison_line_style = dict(mode='lines+markers', marker=dict(color='#bdbdbd', size=5))
+highlight_line_style = dict(mode='lines+markers', marker=dict(color='rgb(192,0,0)'))
+
+
+@profiling.timed('build')
+def fuel_consumption_figure(avg_fuel_consumption, country_names, plotting_data=None, highlight='Canada', skeleton=None,
+                            summary=False, comparison_countries=fuel_consumption_comparison_countries,
+                            comparison_style=comparison_line_style, highlight_style=highlight_line_style):
+    ''' Evolution of average fuel consumption by country, highlight (Canada by default) in red and a few countries for
+        comparison in grey
+
+        plotting_data: result of fuel_consumption_plotting_data (computed from avg_fuel_consumption if not given)
+        skeleton: result of fuel_consumption_skeleton (built from plotting_data if not given), to draw the graph with
+                  several highlighted countries
+        summary: draw the other countries as bands of percentiles (see fuel_consumption_percentiles) rather than a
+                 line each
+        comparison_countries, comparison_style, highlight_style: see highlight_fuel_consumption
+    '''
+    if plotting_data is None:
+        # With the summary, only the highlighted countries are drawn as lines
+        plotting_data = fuel_consumption_plotting_data(
+            avg_fuel_consumption, [highlight] + list(comparison_countries) if summary else None)
+    if skeleton is None:
+        percentiles = fuel_consumption_percentiles(avg_fuel_consumption, country_names) if summary else None
+        skeleton = fuel_consumption_skeleton(plotting_data, country_names, percentiles=percentiles)
+    return highlight_fuel_consumption(skeleton, plotting_data, highlight, comparison_countries=comparison_countries,
+                                      comparison_style=comparison_style, highlight_style=highlight_style)
+
+
+def remove_background_lines(traces, segments, countries):
+    ''' Copy of the background line traces of a skeleton without the lines of countries (see fuel_consumption_skeleton)
+    '''
+    traces = list(traces)
+    keep = {}  # Points kept in the batched traces that lines are cut out of
+    removed_traces = set()
+    for country in countries:
+        if country not in segments:
+            continue
+        trace_index, points = segments[country]
+        if points is None:
+            removed_traces.add(trace_index)
+        else:
+            if trace_index not in keep:
+                keep[trace_index] = np.ones(len(traces[trace_index]['x']), dtype=bool)
+            keep[trace_index][points] = False
+    for trace_index, kept_points in keep.items():
+        trace = traces[trace_index]
+        traces[trace_index] = dict(trace, x=trace['x'][kept_points], y=trace['y'][kept_points])
+    return [trace for trace_index, trace in enumerate(traces) if trace_index not in removed_traces]
+
+
+def highlight_fuel_consumption(skeleton, plotting_data, highlight, label_line_ends=False, return_start=False,
+                               comparison_countries=fuel_consumption_comparison_countries,
+                               comparison_style=comparison_line_style, highlight_style=highlight_line_style):
+    ''' Fuel consumption figure of a skeleton with a highlighted country and the countries it is compared to: only
+        their traces, the title and the line labels are new, the rest of the figure is shared with the skeleton
+
+        label_line_ends: label the lines next to their last data point (in data coordinates) rather than at the right
+                         of the plot, e.g. for lines drawn up to an earlier year (see animation.py)
+        return_start: also return the index of the first trace of the highlighted countries (the traces before it are
+                      the skeleton's, without the lines of the highlighted countries), e.g. to draw the highlighted
+                      traces over the skeleton (see layers.py)
+        comparison_countries: countries drawn for comparison (those without data are left out), in drawing order
+        comparison_style, highlight_style: trace properties of the comparison lines and of the highlighted line (see
+                                           fuel_consumption_comparison_countries for the defaults)
+    '''
+    if highlight not in plotting_data or len(plotting_data[highlight]['years']) == 0:
+        raise ValueError('No fuel consumption data for {}'.format(highlight))
+
+    highlight_color = highlight_style['marker']['color']
+    grey_palette = ['#f7f7f7', '#d9d9d9', '#bdbdbd', '#969696', '#737373', '#525252', '#252525']
+
+    # Highlighted countries and their trace styles, in drawing order (last is drawn on top)
+    # Every other country in country-list.txt is drawn as a thin grey background line
+    comparison_countries = [country for country in comparison_countries
+                            if country != highlight and country in plotting_data]
+    highlighted_country_styles = {country: comparison_style for country in comparison_countries}
+    highlighted_country_styles[highlight] = highlight_style
+
+    # Highlighted countries are drawn on top of the background lines of the others
+    data = remove_background_lines(skeleton['data'], skeleton['background_segments'], highlighted_country_styles)
+    highlight_start = len(data)
+    for country, style in highlighted_country_styles.items():
+        if np.any(plotting_data[country].get('imputed', False)):
+            # Interpolated data points as open markers
+            symbols = np.where(plotting_data[country]['imputed'], 'circle-open', 'circle').tolist()
+            style = dict(style, marker=dict(style['marker'], symbol=symbols))
+        data.append(dict(
+            type='scatter',
+            x=plotting_data[country]['years'],
+            y=plotting_data[country]['fuel-consumption'],
+            name=country,
+            **style
+        ))
+
+    grey_annotation_color = grey_palette[3]
+    # Label texts other than the country name
+    line_label_texts = {
+        'United States': 'US'
+    }
+    layout = skeleton['layout']
+    title_text = ('Canadian car fuel consumption has stopped decreasing' if highlight == 'Canada' else
+                  'Average fuel consumption of cars in {}'.format(highlight))
+    annotations = list(layout['annotations'])
+
+    # Labels of the highlighted line and of the comparison lines, level with the last data point of their line and
+    # moved apart where lines end close to each other (L / 100 km)
+    label_countries = [country for country in [highlight] + comparison_countries
+                       if len(plotting_data[country]['years']) > 0]
+    label_y = spread([float(plotting_data[country]['fuel-consumption'][-1]) for country in label_countries], 0.5)
+    for i, country in enumerate(label_countries):
+        label_color = highlight_color if country == highlight else grey_annotation_color
+        if label_line_ends:
+            label_position = dict(x=int(plotting_data[country]['years'][-1]), xref='x')
+        else:
+            # At the right of the plot (a label in data coordinates would change the x axis range, which every
+            # highlighted country shares, see layers.py)
+            label_position = dict(x=1, xref='paper')
+        annotations.append(dict(
+            text=line_label_texts.get(country, country),
+            font=dict(
+                size=13,
+                color=label_color,
+            ),
+            showarrow=False,
+            y=label_y[i],
+            yref='y',
+            xanchor='left',
+            xshift=8,
+            **label_position
+        ))
+
+    if any(np.any(plotting_data[country].get('imputed', False)) for country in highlighted_country_styles):
+        # Under the notes of the skeleton
+        annotations.append(caption('Open markers: missing years, interpolated', len(skeleton['captions']),
+                                   grey_palette[2]))
+
+    fig = {'data': data, 'layout': dict(layout, title=dict(layout['title'], text=title_text), annotations=annotations)}
+    if return_start:
+        return fig, highlight_start
+    return fig
+
+
+@profiling.timed('build')
+def fuel_consumption_skeleton(plotting_data, country_names, batch_background_lines=True, percentiles=None):
+    ''' Fuel consumption figure without highlighted countries (see highlight_fuel_consumption): a thin grey line for
+        every country in country_names, and the layout without the title and line labels
+
+        The background lines are batched into a single trace unless batch_background_lines is False (e.g. to get one
+        trace per country for hovering in an html export). Where the line of each country is in the traces is kept
+        in background_segments, for the lines of the highlighted countries to be cut out, and the notes under the graph
+        in captions, for the highlighted countries' notes to go under them.
+
+        percentiles: result of fuel_consumption_percentiles, to draw the countries as grey bands between percentiles
+                     and a line for the median instead, the same few traces whatever the number of countries
+    '''
+    grey_palette = ['#f7f7f7', '#d9d9d9', '#bdbdbd', '#969696', '#737373', '#525252', '#252525']
+    background_grey_line_color = '#ededed'  # Not from the grey palette
+    background_line = dict(
+        width=1,
+        color=background_grey_line_color
+    )
+
+    background_segments = {}
+    if percentiles is not None:
+        # Nothing to cut out: the highlighted countries are drawn over the bands
+        percentile_years, percentile_values = percentiles
+        data = percentile_bands(percentile_years, percentile_values, bands=[(10, 90), (25, 75)],
+                                fill_colors=['#f2f2f2', '#e6e6e6'], line=dict(width=1, color=grey_palette[1]))
+    else:
+        background_countries = [country for country in country_names if country in plotting_data]
+        background_series = [(plotting_data[country]['years'], plotting_data[country]['fuel-consumption'])
+                             for country in background_countries]
+        if batch_background_lines:
+            data = [background_lines(background_series, line=background_line)]
+            # Points of each line and of the gap after it
+            start = 0
+            for country, (series_x, series_y) in zip(background_countries, background_series):
+                background_segments[country] = (0, slice(start, start + len(series_x) + 1))
+                start += len(series_x) + 1
+        else:
+            data = background_line_traces(background_series, line=background_line)
+            background_segments = {country: (i, None) for i, country in enumerate(background_countries)}
+
+    axis_color = grey_palette[3]
+    gridline_color = grey_palette[0]
+    layout = dict(
+        font=dict(
+            family='Akzidenz-Grotesk BQ'  # Can be replaced with any font installed on computer
+        ),
+        plot_bgcolor='#ffffff',
+        xaxis=dict(
+            tickvals=list(range(2005, 2018, 2)),
+            showgrid=True,
+            gridcolor=gridline_color,
+            showline=False,
+            tickfont=dict(
+                color=axis_color
+            ),
+            ticklen=6,
+            tickcolor='#ffffff'
+        ),
+        yaxis=dict(
+            range=[2, 11.5],
+            showgrid=True,
+            gridcolor=gridline_color,
+            showline=False,
+            tickfont=dict(
+                color=axis_color
+            ),
+            ticklen=4,
+            tickcolor='#ffffff'
+        ),
+        showlegend=False,
+        title=dict(
+            text='',  # Set by highlight_fuel_consumption
+            xref='paper',
+            x=0,
+            font=dict(
+                size=18,
+                color=grey_palette[5]
+            )
+        ),
+        # Annotation position is specified manually
+        annotations=[dict(
+            text="Average litres of gasoline-equivalent per 100 km (L / 100 km)",
+            font=dict(
+                size=13,
+                color=grey_palette[2],
+            ),
+            showarrow=False,
+            x=0,
+            y=1.1275,
+            xref='paper',
+            yref='paper',
+        )]
+    )
+    # Notes under the graph, one per line
+    captions = []
+    if percentiles is not None:
+        captions.append('Grey bands: middle 80% and 50% of countries, grey line: median')
+    layout['annotations'] += [caption(text, i, grey_palette[2]) for i, text in enumerate(captions)]
+
+    skeleton = figure_spec(data, layout)
+    skeleton['background_segments'] = background_segments
+    skeleton['captions'] = captions
+    return skeleton
+
+
+# Ways of drawing the points of the fuel consumption vs price scatter that aren't labelled: SVG markers, WebGL markers
+# (drawn on a canvas, much faster with many points), or a heatmap of the number of points in each cell of a grid (the
+# same size whatever the number of points). 'auto' picks one from the number of points (see scatter_mode).
+scatter_modes = ['svg', 'webgl', 'density']
+webgl_min_points = 5000
+density_min_points = 100000
+
+# Cells of the density heatmap (along the price, fuel consumption axes)
+density_bins = (120, 80)
+
+
+def scatter_mode(number_of_points, mode='auto'):
+    ''' Mode drawing number_of_points points (see scatter_modes) '''
+    if mode != 'auto':
+        if mode not in scatter_modes:
+            raise ValueError('Unknown scatter mode {} (modes: auto, {})'.format(mode, ', '.join(scatter_modes)))
+        return mode
+    if number_of_points >= density_min_points:
+        return 'density'
+    if number_of_points >= webgl_min_points:
+        return 'webgl'
+    return 'svg'
+
+
+def density_grid(x, y, bins=density_bins):
+    ''' Centers of the cells of a grid spanning the points (x, y) and the number of points in each cell (one row of
+        counts per cell along y, as heatmaps take them)
+    '''
+    x_bins, y_bins = bins
+    centers = []
+    cells = []
+    for values, number_of_bins in ((x, x_bins), (y, y_bins)):
+        low, high = (values.min(), values.max()) if len(values) else (0, 1)
+        width = (high - low) / number_of_bins or 1
+        centers.append(low + width * (np.arange(number_of_bins) + 0.5))
+        # The highest values are in the last cell rather than past it
+        cells.append(np.minimum(((values - low) / width).astype(np.int64), number_of_bins - 1))
+    counts = np.bincount(cells[1] * x_bins + cells[0], minlength=x_bins * y_bins)
+    return centers[0], centers[1], counts.reshape(y_bins, x_bins)
+
+
+def density_trace(x, y, colors, bins=density_bins):
+    ''' Heatmap of the number of points (x, y) in each cell of a grid, on a log scale of colors (empty cells aren't
+        drawn)
+    '''
+    x_centers, y_centers, counts = density_grid(x, y, bins)
+    with np.errstate(divide='ignore'):
+        z = np.where(counts > 0, np.log10(counts), np.nan)
+    return dict(
+        type='heatmap',
+        x=x_centers,
+        y=y_centers,
+        z=z,
+        customdata=counts.astype(np.int32),
+        colorscale=[[0, colors[0]], [1, colors[1]]],
+        showscale=False,
+        hovertemplate='%{customdata} points<extra></extra>'
+    )
+
+
+def consumption_vs_price_years(fuel_consumption, pump_prices):
+    ''' Years for which at least one country has both a fuel consumption and a pump price '''
+    matches = countries.join(fuel_consumption, pump_prices)
+    years = [year for year in fuel_consumption.years if year in pump_prices.year_index]
+    both = [np.any(~np.isnan(year_fuel_consumptions) & ~np.isnan(year_pump_prices))
+            for year_fuel_consumptions, year_pump_prices in map(matches.columns, years)]
+    return [year for year, has_data in zip(years, both) if has_data]
+
+
+@profiling.timed('organize')
+def consumption_vs_price_plotting_data(fuel_consumption, pump_prices, year=2016):
+    ''' Names, fuel consumptions and pump prices of the countries that have both in a year '''
+    # Select and organize data: both sources are joined on ISO-3 country codes (names are spelled differently)
+    matches = countries.join(fuel_consumption, pump_prices)
+    if matches.unmatched_names:
+        warnings.warn('No ISO-3 code for {} (add them to countries.aliases)'.format(', '.join(matches.unmatched_names)))
+    # Countries of the pump prices that aren't in the fuel consumption table aren't reported: the World Bank files list
+    # every country and aggregates
+    if matches.left_only:
+        warnings.warn('No pump prices for {} (no row with their ISO-3 code)'.format(', '.join(matches.left_only)))
+    year_fuel_consumptions, year_pump_prices = matches.columns(year)
+
+    # Keep countries that have both data dimensions
+    complete = ~np.isnan(year_fuel_consumptions) & ~np.isnan(year_pump_prices)
+    country_names = [country for country, has_data in zip(matches.countries(), complete) if has_data]
+    year_fuel_consumptions = year_fuel_consumptions[complete]
+    year_pump_prices = year_pump_prices[complete]
+    #print(country_names)
+    return country_names, year_fuel_consumptions, year_pump_prices
+
+
+@profiling.timed('build')
+def consumption_vs_price_figure(fuel_consumption, pump_prices, year=2016, plotting_data=None, highlight='Canada',
+                                trend=None, mode='auto'):
+    ''' Average fuel consumption vs pump price for gasoline by country in a year (2016 by default), highlight (Canada by
+        default) in red
+
+        plotting_data: result of consumption_vs_price_plotting_data (computed from the tables if not given)
+        trend: result of regression.trend for the plotting data, to draw the fitted curve and its confidence band under
+               the points
+        mode: how the points that aren't labelled are drawn, see scatter_modes (the labelled points are always SVG
+              markers, over them)
+    '''
+    if plotting_data is None:
+        plotting_data = consumption_vs_price_plotting_data(fuel_consumption, pump_prices, year)
+    country_names, year_fuel_consumptions, year_pump_prices = plotting_data
+
+    # Separate data points that will be labeled (if they have data for the year)
+    label_positions = {
+        'Canada': 'top right',
+        'United States': 'top left',
+        'Malaysia': 'top right',
+        'India': 'top left',
+        'Germany': 'top left',
+        'Portugal': 'bottom right',
+        'Iceland': 'top right',
+        'Argentina': 'top right'
+    }
+    if highlight not in label_positions:
+        label_positions[highlight] = 'top right'
+    # Only the labelled countries are looked up: there can be many more points (see scatter_modes)
+    if highlight not in country_names:
+        raise ValueError('No fuel consumption and pump price for {} in {}'.format(highlight, year))
+    labelled_countries = [country for country in label_positions.keys() if country in country_names]
+    labelled_rows = [country_names.index(country) for country in labelled_countries]
+    unlabelled_rows = np.ones(len(country_names), dtype=bool)
+    unlabelled_rows[labelled_rows] = False
+    #print(labelled_countries)
+
+    highlight_color = '#c00000'
+    grey_palette = ['#f7f7f7', '#d9d9d9', '#bdbdbd', '#969696', '#737373', '#525252', '#252525']
+    labelled_point_colors = [highlight_color if country == highlight else grey_palette[4]
+                             for country in labelled_countries]
+    #print(labelled_point_colors)
+
+    # Organize data for plotting
+    labelled_fuel_consumptions = year_fuel_consumptions[labelled_rows]
+    labelled_pump_prices = year_pump_prices[labelled_rows]
+    unlabelled_fuel_consumptions = year_fuel_consumptions[unlabelled_rows]
+    unlabelled_pump_prices = year_pump_prices[unlabelled_rows]
+
+    # Leave room for the labels of the points closest to the sides
+    x_padding = 0.1 * (year_pump_prices.max() - year_pump_prices.min())
+    x_range = [year_pump_prices.min() - x_padding, year_pump_prices.max() + x_padding]
+
+    # Plot fuel consumption based on pump price
+    labelled_points = dict(
+        type='scatter',
+        x=labelled_pump_prices,
+        y=labelled_fuel_consumptions,
+        mode='markers+text',
+        marker=dict(
+            color=labelled_point_colors
+        ),
+        text=labelled_countries,
+        textposition=[label_positions[country] for country in labelled_countries]
+    )
+
+    mode = scatter_mode(len(unlabelled_pump_prices), mode)
+    if mode == 'density':
+        unlabelled_points = density_trace(unlabelled_pump_prices, unlabelled_fuel_consumptions,
+                                          colors=[grey_palette[1], grey_palette[3]])
+    else:
+        unlabelled_points = dict(
+            type='scattergl' if mode == 'webgl' else 'scatter',
+            x=unlabelled_pump_prices,
+            y=unlabelled_fuel_consumptions,
+            mode='markers',
+            marker=dict(
+                color=grey_palette[2]
+            )
+        )
+
+    axis_color = grey_palette[3]
+    gridline_color = grey_palette[0]
+    layout = dict(
+        font=dict(
+            family='Akzidenz-Grotesk BQ'  # Can be replaced with any font installed on computer
+        ),
+        plot_bgcolor='#ffffff',
+        xaxis=dict(
+            range=x_range,
+            showgrid=True,
+            gridcolor=gridline_color,
+            showline=False,
+            tickfont=dict(
+                color=axis_color
+            ),
+            ticklen=4,
+            tickcolor='#ffffff'
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor=gridline_color,
+            showline=False,
+            tickfont=dict(
+                color=axis_color
+            ),
+            ticklen=4,
+            tickcolor='#ffffff'
+        ),
+        showlegend=False,
+        title=dict(
+            text='Cars tend to be more fuel efficient in countries where gas costs more',
+            xref='paper',
+            x=0,
+            font=dict(
+                size=18,
+                color=grey_palette[5]
+            )
+        ),
+        annotations=[dict(
+            text='Canadians and Americans pay less for their gas and their cars use more',
+            font=dict(
+                size=13,
+                color=grey_palette[2],
+            ),
+            showarrow=False,
+            x=0,
+            y=1.1275,
+            xref='paper',
+            yref='paper',
+        )]
+    )
+
+    data = [unlabelled_points, labelled_points]
+    # Notes under the graph, one per line
+    captions = []
+    if trend is not None:
+        band_and_line = trend_traces(trend, line_color=grey_palette[3], fill_color='rgba(189,189,189,0.25)')
+        # Under the points, but over the density heatmap, which would hide it
+        data = data[:1] + band_and_line + data[1:] if mode == 'density' else band_and_line + data
+        # Change of the fuel consumption for 10 cents more per litre
+        change = np.exp(trend['slope'] * 0.1) - 1
+        trend_caption = 'Trend: {:+.1%} fuel consumption per +$0.10 / L ({} fit)'.format(change, trend['model'])
+        if trend['lower'] is not None:
+            trend_caption += ', shaded: {:.0%} bootstrap confidence band'.format(trend['confidence'])
+        captions.append(trend_caption)
+    if mode == 'density':
+        captions.append('Shading: number of points in each cell (log scale)')
+    layout['annotations'] += [caption(text, i, grey_palette[2]) for i, text in enumerate(captions)]
+
+    return figure_spec(data, layout)
+
+
+# Graphs drawn by render-graphs.py, by name: output file (in graphs/, without extension), tables used (see
+# datasets.loaders), other files the graph is drawn from (see build.py) and a function building the figure from the
+# loaded tables
+graphs = {
+    'co2': dict(
+        filename='avg-co2-emissions-2017',
+        tables=['co2-emissions'],
+        # Options: highlight (see chart-service.py)
+        figure=lambda tables, **options: co2_emissions_figure(tables['co2-emissions'], **options)
+    ),
+    'lines': dict(
+        filename='avg-fuel-consumption-canada',
+        tables=['fuel-consumption'],
+        inputs=[country_list_filepath],
+        # Options: highlight, comparison_countries and line styles (see fuel_consumption_figure)
+        figure=lambda tables, **options: fuel_consumption_figure(tables['fuel-consumption'],
+                                                                 read_country_list(country_list_filepath), **options)
+    ),
+    'scatter': dict(
+        filename='fuel-consumption-vs-price',
+        tables=['fuel-consumption', 'pump-prices'],
+        # Options: year (2016 by default), highlight and mode (see scatter_modes)
+        figure=lambda tables, **options: consumption_vs_price_figure(tables['fuel-consumption'], tables['pump-prices'],
+                                                                     **options),
+        # Years for which the graph can be drawn (see render-graphs.py --year and --all-years)
+        years=lambda tables: consumption_vs_price_years(tables['fuel-consumption'], tables['pump-prices'])
+    )
+}
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+'''
+    Checks that every animation can be written with every encoder installed (see animation.py)
+
+    Animates each graph in every format an encoder writes, for Canada and for a country whose data starts late (whose
+    frames start at its first year), into a temporary directory, and checks that each file is a complete animation of
+    its format. Also checks that an animation whose frames fail midway leaves neither a partial file nor a temporary
+    one. Encoders that aren't installed are skipped. Run it after changing animation.py.
+
+    Usage: python check-animations.py [--highlight Canada Austria] [--jobs 2]
+'''
+
+from pathlib import Path
+import argparse
+import os
+import sys
+import tempfile
+
+import animation
+import datasets
+import export
+
+# Formats each encoder writes
+encoder_formats = {
+    'ffmpeg': animation.formats,
+    'pillow': ['gif', 'webp']
+}
+
+
+def encoder_installed(encoder):
+    if encoder == 'ffmpeg':
+        return animation.ffmpeg_executable() is not None
+    try:
+        animation.pillow_image()
+    except ImportError:
+        return False
+    return True
+
+
+def is_animation(filepath, format):
+    ''' Whether a file starts like a file of format '''
+    with open(filepath, 'rb') as file:
+        header = file.read(12)
+    if format == 'gif':
+        return header.startswith(b'GIF8')
+    if format == 'webp':
+        return header.startswith(b'RIFF') and header[8:12] == b'WEBP'
+    return header[4:8] == b'ftyp'
+
+
+def failing_frames(tables, highlight):
+    ''' Frames of the CO2 emissions animation, failing after the first one '''
+    reference, frames, number_of_frames = animation.co2_emissions_frames(tables, highlight)
+
+    def failing(full_layout):
+        for i, frame in enumerate(frames(full_layout)):
+            if i == 1:
+                raise RuntimeError('Frame failed')
+            yield frame
+
+    return reference, failing, number_of_frames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--highlight', nargs='+', default=['Canada', 'Austria'], help='Highlighted countries')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Number of render workers')
+    args = parser.parse_args()
+
+    animation.animations['failing'] = dict(filename='failing-{}', tables=['co2-emissions'], frames=failing_frames)
+    tables = datasets.load(sorted({table for name in animation.animations
+                                   for table in animation.animations[name]['tables']}))
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory, export.render_pool(size=max(1, args.jobs)) as pool:
+        for encoder, formats in encoder_formats.items():
+            if not encoder_installed(encoder):
+                print('{}: not installed, skipped'.format(encoder))
+                continue
+            for format in formats:
+                for highlight in args.highlight:
+                    for name in animation.animations:
+                        filepath = Path(directory) / '{}-{}-{}.{}'.format(name, highlight, encoder, format)
+                        check = '{} {} {} {}'.format(encoder, format, name, highlight)
+                        try:
+                            number_of_frames = animation.write_animation(
+                                pool, name, tables, filepath, format=format, highlight=highlight, encoder=encoder)
+                        except Exception as error:
+                            if name == 'failing' and not filepath.exists() and not list(Path(directory).glob('*.tmp')):
+                                print('{}: ok (nothing written)'.format(check))
+                                continue
+                            failures += 1
+                            print('{}: failed ({})'.format(check, error))
+                            continue
+                        if name == 'failing':
+                            failures += 1
+                            print('{}: written, although a frame failed'.format(check))
+                        elif not is_animation(filepath, format):
+                            failures += 1
+                            print('{}: not a {} file'.format(check, format))
+                        else:
+                            print('{}: ok ({} frames, {} kB)'.format(check, number_of_frames,
+                                                                      filepath.stat().st_size // 1000))
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+'''
+    Checks the figure specs of every graph against plotly's schema
+
+    Figures are built as plain dictionaries that skip plotly.graph_objs validation (see charts.py), so a misspelled
+    property or an invalid value would only show up as a wrong graph. This builds every graph (for every year, for
+    graphs drawn by year, with another highlighted country, the summary and interpolated fuel consumption graphs and
+    the scatter with its trend and in every mode) and validates it once with go.Figure, which raises on anything
+    plotly doesn't accept. Run it after changing charts.py.
+
+    Usage: python check-figures.py
+'''
+
+import sys
+
+# Installing plotly: https://plot.ly/python/getting-started/
+import plotly.graph_objs as go
+
+import charts
+import datasets
+import regression
+
+if __name__ == '__main__':
+    table_names = sorted({table for graph in charts.graphs.values() for table in graph['tables']})
+    tables = datasets.load(table_names)
+
+    failures = 0
+    for name, graph in charts.graphs.items():
+        figures = {name: graph['figure'](tables)}
+        # Another highlighted country (see render-country-graphs.py)
+        figures['{} highlight France'.format(name)] = graph['figure'](tables, highlight='France')
+        if 'years' in graph:
+            figures.update({'{} {}'.format(name, year): graph['figure'](tables, year=year)
+                            for year in graph['years'](tables)})
+        if name == 'lines':
+            # The other countries as percentile bands (see average-fuel-consumption.py --summary)
+            figures['lines summary'] = graph['figure'](tables, summary=True)
+            # Missing years interpolated, drawn as open markers (see datasets.interpolate)
+            figures['lines interpolated'] = graph['figure'](datasets.load(graph['tables'], interpolation='linear'))
+        if name == 'scatter':
+            # Fitted trend and its bootstrap band (see fuel-consumption-vs-price.py --trend)
+            country_names, fuel_consumptions, pump_prices = charts.consumption_vs_price_plotting_data(
+                tables['fuel-consumption'], tables['pump-prices'])
+            figures['scatter trend'] = graph['figure'](
+                tables, trend=regression.trend(pump_prices, fuel_consumptions, 'robust', replicates=100))
+            # WebGL markers and density heatmap, drawn instead of SVG markers for many points (see charts.scatter_modes)
+            figures.update({'scatter {}'.format(mode): graph['figure'](tables, mode=mode)
+                            for mode in charts.scatter_modes if mode != 'svg'})
+
+        for figure_name, fig in figures.items():
+            try:
+                go.Figure(fig)
+            except ValueError as error:
+                failures += 1
+                print('{}: invalid figure spec\n{}'.format(figure_name, error))
+            else:
+                print('{}: ok'.format(figure_name))
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+'''
+    Checks the cold start time of the modules and of the data-only commands against time budgets
+
+    Plotly is only imported to build and export figures (see charts.template and export.plotly_io): importing the
+    modules, or running a command that only reads data, must not import it. Each target is started in a fresh
+    interpreter --runs times, and fails the check if its best time is over budget or if it imports plotly when it
+    shouldn't. The slowest imports of failing targets are listed (from python -X importtime).
+
+    Usage: python check-startup.py [--runs 5]
+'''
+
+from pathlib import Path
+import argparse
+import subprocess
+import sys
+import time
+
+directory = Path(__file__).resolve().parent
+
+# Targets: arguments of the interpreter, time budget (s) of a whole cold start, and whether plotly may be imported
+# Budgets leave room for slower machines (the data-only targets take about 0.15s on a recent laptop, of which 0.09s is
+# importing numpy) but catch plotly, or another heavy dependency, being imported at startup again
+targets = {
+    'import datasets': (['-c', 'import datasets'], 0.25, False),
+    'import countries, wdi': (['-c', 'import countries, wdi'], 0.25, False),
+    'import charts, export, renderer': (['-c', 'import charts, export, renderer'], 0.3, False),
+    'show-tables.py': (['show-tables.py'], 0.3, False),
+    'extract-wdi-indicators.py --help': (['extract-wdi-indicators.py', '--help'], 0.3, False)
+}
+
+# Number of slowest imports listed for failing targets
+slowest_imports = 10
+
+
+def run(arguments):
+    ''' Wall time of a cold start and the import times reported by python -X importtime (module: cumulative us) '''
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime'] + arguments, cwd=directory,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    elapsed = time.perf_counter() - start
+
+    import_times = {}
+    for line in process.stderr.splitlines():
+        # e.g. "import time:       508 |      17844 | plotly.io"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative_time, module = line[len('import time:'):].split('|')
+        import_times[module.strip()] = int(cumulative_time)
+    return elapsed, import_times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts of each target (the best time is kept)')
+    args = parser.parse_args()
+
+    failures = 0
+    for name, (arguments, budget, plotly_allowed) in targets.items():
+        runs = [run(arguments) for i in range(args.runs)]
+        elapsed, import_times = min(runs, key=lambda result: result[0])
+
+        problems = []
+        if elapsed > budget:
+            problems.append('over budget')
+        if not plotly_allowed and any(module.split('.')[0] == 'plotly' for module in import_times):
+            problems.append('imports plotly')
+        print('{:<36} {:.3f}s (budget {:.2f}s){}'.format(name, elapsed, budget,
+                                                         '  FAILED: ' + ', '.join(problems) if problems else ''))
+        if problems:
+            failures += 1
+            # Top-level imports (the cumulative time of a package includes its submodules)
+            top_level = {module: cumulative for module, cumulative in import_times.items() if '.' not in module}
+            for module, cumulative in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:slowest_imports]:
+                print('    {:>8.3f}s  {}'.format(cumulative / 1e6, module))
+
+    sys.exit(1 if failures else 0)
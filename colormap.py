@@ -0,0 +1,65 @@
+'''
+    Vectorized colormaps (e.g. the yellow-orange-red gradient of the CO2 emissions bars)
+
+    A Colormap interpolates linearly between color stops. The interpolation is computed once as a lookup table of hex
+    colors, cached per stop set, and whole arrays of values are then mapped to colors with NumPy indexing.
+'''
+
+import functools
+
+import numpy as np
+
+
+def hex_to_rgb(hex_color):
+    ''' "#FFFFFF" -> (255, 255, 255) '''
+    return tuple(int(hex_color[i:i + 2], 16) for i in range(1, 6, 2))
+
+
+def rgb_to_hex(rgb):
+    ''' (255, 255, 255) -> "#ffffff" '''
+    return '#{:02x}{:02x}{:02x}'.format(*(int(round(component)) for component in rgb))
+
+
+@functools.lru_cache(maxsize=32)
+def lookup_table(colors, positions, size):
+    ''' Hex colors of size evenly spaced points between the color stops (colors as RGB tuples, positions from 0 to 1) '''
+    samples = np.linspace(0, 1, size)
+    rgb = np.column_stack([np.interp(samples, positions, [color[channel] for color in colors]) for channel in range(3)])
+    rgb = np.rint(rgb).astype(np.uint8)
+    return np.array(['#{:02x}{:02x}{:02x}'.format(*color) for color in rgb])
+
+
+class Colormap:
+    ''' Piecewise-linear colormap between color stops
+
+        colors: hex strings or RGB triplets
+        positions: position of each stop from 0 to 1 (default: evenly spaced)
+        size: number of entries of the lookup table
+    '''
+
+    def __init__(self, colors, positions=None, size=256):
+        if len(colors) < 2:
+            raise ValueError('A colormap needs at least 2 colors')
+        self.colors = tuple(hex_to_rgb(color) if isinstance(color, str) else tuple(color) for color in colors)
+        if positions is None:
+            positions = np.linspace(0, 1, len(colors))
+        if len(positions) != len(colors) or np.any(np.diff(positions) < 0):
+            raise ValueError('Positions must be increasing, one per color')
+        self.positions = tuple(float(position) for position in positions)
+        self.size = size
+
+    def __call__(self, values, vmin=None, vmax=None):
+        ''' Hex colors of values (any array-like of numbers) between vmin and vmax (default: their minimum and maximum)
+
+            Values outside [vmin, vmax] get the color of the closest end, NaN values the color of vmin.
+        '''
+        table = lookup_table(self.colors, self.positions, self.size)
+        values = np.asarray(values, dtype=np.float64)
+        if vmin is None:
+            vmin = np.nanmin(values)
+        if vmax is None:
+            vmax = np.nanmax(values)
+
+        scaled = (values - vmin) / (vmax - vmin) if vmax > vmin else np.zeros_like(values)
+        scaled = np.nan_to_num(np.clip(scaled, 0, 1), nan=0)
+        return table[np.rint(scaled * (self.size - 1)).astype(np.intp)]
@@ -0,0 +1,178 @@
+'''
+    Joining of data sources on ISO 3166-1 alpha-3 country codes
+
+    The GFEI tables and World Bank files don't spell every country the same way (e.g. "Korea" vs "Korea, Rep.",
+    "Egypt" vs "Egypt, Arab Rep."), so joining them on names silently drops countries. Tables are instead joined on
+    ISO-3 codes: World Bank files carry their codes, and names are converted to codes through a name index built from
+    the alias table below and from the names and codes of World Bank tables.
+'''
+
+import re
+import unicodedata
+
+import numpy as np
+
+# ISO-3 codes of the countries in the GFEI tables and of common alternative spellings
+aliases = {
+    'Argentina': 'ARG',
+    'Australia': 'AUS',
+    'Austria': 'AUT',
+    'Belgium': 'BEL',
+    'Brazil': 'BRA',
+    'Bulgaria': 'BGR',
+    'Canada': 'CAN',
+    'Chile': 'CHL',
+    'China': 'CHN',
+    'Croatia': 'HRV',
+    'Cyprus': 'CYP',
+    'Czech Republic': 'CZE',
+    'Czechia': 'CZE',
+    'Denmark': 'DNK',
+    'Egypt': 'EGY',
+    'Egypt, Arab Rep.': 'EGY',
+    'Estonia': 'EST',
+    'Finland': 'FIN',
+    'France': 'FRA',
+    'Germany': 'DEU',
+    'Greece': 'GRC',
+    'Hungary': 'HUN',
+    'Iceland': 'ISL',
+    'India': 'IND',
+    'Indonesia': 'IDN',
+    'Ireland': 'IRL',
+    'Italy': 'ITA',
+    'Japan': 'JPN',
+    'Korea': 'KOR',
+    'Korea, Rep.': 'KOR',
+    'South Korea': 'KOR',
+    'Republic of Korea': 'KOR',
+    'Latvia': 'LVA',
+    'Lithuania': 'LTU',
+    'Luxembourg': 'LUX',
+    'Macedonia': 'MKD',
+    'North Macedonia': 'MKD',
+    'Macedonia, FYR': 'MKD',
+    'Malaysia': 'MYS',
+    'Malta': 'MLT',
+    'Mexico': 'MEX',
+    'Netherlands': 'NLD',
+    'Norway': 'NOR',
+    'Peru': 'PER',
+    'Philippines': 'PHL',
+    'Poland': 'POL',
+    'Portugal': 'PRT',
+    'Romania': 'ROU',
+    'Russian Federation': 'RUS',
+    'Russia': 'RUS',
+    'Slovakia': 'SVK',
+    'Slovak Republic': 'SVK',
+    'Slovenia': 'SVN',
+    'South Africa': 'ZAF',
+    'Spain': 'ESP',
+    'Sweden': 'SWE',
+    'Switzerland': 'CHE',
+    'Thailand': 'THA',
+    'Turkey': 'TUR',
+    'Turkiye': 'TUR',
+    'Ukraine': 'UKR',
+    'United Kingdom': 'GBR',
+    'UK': 'GBR',
+    'United States': 'USA',
+    'United States of America': 'USA',
+    'US': 'USA',
+    'USA': 'USA'
+}
+
+
+def normalize(name):
+    ''' "Korea, Rep." -> "korea rep", "Türkiye" -> "turkiye" '''
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name.casefold()).split())
+
+
+class CodeIndex:
+    ''' Precomputed index of normalized country names to ISO-3 codes '''
+
+    def __init__(self, tables=()):
+        self.codes = {normalize(name): code for name, code in aliases.items()}
+        for table in tables:
+            self.add(table)
+
+    def add(self, table):
+        ''' Adds the names of a table that has ISO-3 codes (e.g. a World Bank table) '''
+        if table.country_codes is not None:
+            for name, code in zip(table.countries, table.country_codes):
+                self.codes.setdefault(normalize(name), code)
+
+    def code(self, name):
+        ''' ISO-3 code of a country name, or '' if unknown '''
+        return self.codes.get(normalize(name), '')
+
+    def table_codes(self, table):
+        ''' ISO-3 codes of every row of a table as a NumPy string array ('' for unknown names) '''
+        if table.country_codes is not None:
+            return np.array(table.country_codes, dtype='U3')
+        return np.array([self.code(name) for name in table.countries], dtype='U3')
+
+
+class Join:
+    ''' Rows of two tables matched on ISO-3 codes
+
+        left_rows and right_rows are aligned row indices into the left and right tables. unmatched_names lists the
+        country names (of either table) that couldn't be converted to a code, and are therefore missing from the join.
+        left_only and right_only list the names of the rows of each table that have a code, but no row with the same
+        code in the other table.
+    '''
+
+    def __init__(self, left, right, left_rows, right_rows, codes, unmatched_names, left_only=(), right_only=()):
+        self.left = left
+        self.right = right
+        self.left_rows = left_rows
+        self.right_rows = right_rows
+        self.codes = codes
+        self.unmatched_names = unmatched_names
+        self.left_only = list(left_only)
+        self.right_only = list(right_only)
+
+    def __len__(self):
+        return len(self.left_rows)
+
+    def countries(self):
+        ''' Names of the joined countries, as spelled in the left table '''
+        return [self.left.countries[row] for row in self.left_rows]
+
+    def columns(self, year):
+        ''' Left and right values for a year, for each joined country '''
+        return self.left.column(year)[self.left_rows], self.right.column(year)[self.right_rows]
+
+
+def join(left, right, index=None):
+    ''' Inner join of the rows of two tables on ISO-3 codes
+
+        Codes are matched in one vectorized pass: right codes are sorted once and left codes are looked up with a
+        binary search, so the join stays fast against large tables (e.g. the full World Bank catalogue of countries and
+        aggregates). Left rows keep their order.
+    '''
+    if index is None:
+        index = CodeIndex([left, right])
+    left_codes = index.table_codes(left)
+    right_codes = index.table_codes(right)
+
+    right_order = np.argsort(right_codes, kind='stable')
+    sorted_right_codes = right_codes[right_order]
+    if len(sorted_right_codes) == 0:
+        positions = np.zeros(len(left_codes), dtype=np.intp)
+        matched = np.zeros(len(left_codes), dtype=bool)
+    else:
+        positions = np.minimum(np.searchsorted(sorted_right_codes, left_codes), len(sorted_right_codes) - 1)
+        matched = (left_codes != '') & (sorted_right_codes[positions] == left_codes)
+
+    unmatched_names = [left.countries[row] for row in np.flatnonzero(left_codes == '')] + \
+                      [right.countries[row] for row in np.flatnonzero(right_codes == '')]
+    # Rows with a code missing from the other table
+    left_only = [left.countries[row] for row in np.flatnonzero((left_codes != '') & ~matched)]
+    right_only = [right.countries[row]
+                  for row in np.flatnonzero((right_codes != '') & ~np.isin(right_codes, left_codes[matched]))]
+    left_rows = np.flatnonzero(matched)
+    return Join(left, right, left_rows, right_order[positions[matched]], left_codes[matched], unmatched_names,
+                left_only, right_only)
@@ -0,0 +1,375 @@
+'''
+    Loading of the GFEI and World Bank data files into country x year matrices
+
+    Each file is parsed once into a Table: a NumPy float matrix of values (one row per country, one column per year,
+    NaN for missing data points) with its country and year indices. Parsed tables are cached as binary .npy files in
+    cache/ that are memory-mapped on later runs, so re-runs skip text parsing entirely. A cached table is rebuilt when
+    its source file changes (different modification time and content hash).
+
+    The gaps of a table (missing years between two data points of a country) can be filled by interpolation (see
+    interpolate), for the whole matrix at once. Interpolated tables are cached next to the parsed ones, with a mask of
+    the interpolated data points.
+'''
+
+from pathlib import Path
+import csv
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+import profiling
+
+data_directory = Path(__file__).resolve().parent / 'data'
+cache_directory = Path(__file__).resolve().parent / 'cache'
+
+# Permissions of the cache files, as open() would create them (the umask can only be read by setting it)
+umask = os.umask(0)
+os.umask(umask)
+file_mode = 0o666 & ~umask
+
+co2_emissions_filepath = data_directory / 'GFEI-C2-Average-CO2-emissions-per-km.csv'
+fuel_consumption_filepath = data_directory / 'GFEI-C3-Average-fuel-consumption.csv'
+pump_price_filepath = data_directory / 'WorldBank-Pump-Price-Gasoline-USD-per-litre.csv'
+
+# Bump when the parsed format changes to invalidate existing caches
+cache_format_version = 2
+
+# Ways of filling the gaps of a table (see interpolate): linear interpolation, the previous value, or none
+interpolation_modes = ['linear', 'step', 'none']
+
+# Bump when interpolate changes to invalidate the cached interpolated tables
+interpolation_version = 1
+
+
+class Table:
+    ''' Country x year matrix of values with its country and year indices '''
+
+    def __init__(self, values, countries, years, country_codes=None, imputed=None):
+        self.values = values  # 2D float array, NaN for missing data points
+        self.imputed = imputed  # 2D bool array of the interpolated data points (see interpolate), None if none are
+        self.countries = list(countries)
+        self.years = [int(year) for year in years]
+        self.country_codes = list(country_codes) if country_codes is not None else None  # ISO-3 codes (World Bank)
+        self.country_index = {country: i for i, country in enumerate(self.countries)}
+        self.year_index = {year: j for j, year in enumerate(self.years)}
+
+    def __repr__(self):
+        return 'Table({} countries x {} years, {}-{})'.format(len(self.countries), len(self.years),
+                                                            self.years[0], self.years[-1])
+
+    def row(self, country):
+        ''' Values of a country for every year (NaN for missing data points) '''
+        return self.values[self.country_index[country]]
+
+    def column(self, year):
+        ''' Values of every country for a year (NaN for missing data points), looked up by column header '''
+        if year not in self.year_index:
+            raise ValueError('No column for {} (years: {}-{})'.format(year, self.years[0], self.years[-1]))
+        return self.values[:, self.year_index[year]]
+
+    def series(self, country):
+        ''' Years and values of a country, skipping missing data points '''
+        row = self.row(country)
+        present = ~np.isnan(row)
+        return np.asarray(self.years)[present], row[present]
+
+    def imputed_series(self, country):
+        ''' Which data points of series(country) are interpolated (see interpolate) '''
+        row = self.row(country)
+        if self.imputed is None:
+            return np.zeros(np.count_nonzero(~np.isnan(row)), dtype=bool)
+        return self.imputed[self.country_index[country]][~np.isnan(row)]
+
+
+def interpolate(values, years, mode='linear'):
+    ''' Values of a country x year matrix with the gaps between data points of each country filled, and a mask of the
+        filled ones
+
+        mode: 'linear' (interpolated between the data points before and after, by year), 'step' (the data point
+              before) or 'none'. Missing years before the first or after the last data point of a country stay
+              missing.
+    '''
+    if mode not in interpolation_modes:
+        raise ValueError('Unknown interpolation mode {} (modes: {})'.format(mode, ', '.join(interpolation_modes)))
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    if mode == 'none':
+        return values.copy(), np.zeros(values.shape, dtype=bool)
+
+    # Column of the data point before and after every point of each row (-1 or the number of columns if none)
+    columns = np.arange(values.shape[1])
+    previous = np.maximum.accumulate(np.where(present, columns, -1), axis=1)
+    following = np.minimum.accumulate(np.where(present, columns, values.shape[1])[:, ::-1], axis=1)[:, ::-1]
+    imputed = ~present & (previous >= 0) & (following < values.shape[1])
+
+    previous_values = np.take_along_axis(values, np.maximum(previous, 0), axis=1)
+    if mode == 'step':
+        filled_values = previous_values
+    else:
+        following_values = np.take_along_axis(values, np.minimum(following, values.shape[1] - 1), axis=1)
+        years = np.asarray(years, dtype=np.float64)
+        previous_years = years[np.maximum(previous, 0)]
+        following_years = years[np.minimum(following, values.shape[1] - 1)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = (years - previous_years) / (following_years - previous_years)
+        filled_values = previous_values + fraction * (following_values - previous_values)
+    return np.where(imputed, filled_values, values), imputed
+
+
+def parse_value(cell):
+    cell = cell.strip()
+    return float(cell) if cell != '' else np.nan
+
+
+def parse_gfei(filepath):
+    ''' Parses a GFEI table (e.g. C.2, C.3): a few title lines, a header row of years, one row per country '''
+    # The GFEI files were exported from Excel on Windows
+    with open(filepath, 'r', encoding='cp1252', newline='') as file:
+        csv_reader = csv.reader(file)
+
+        # Skip the table title lines up to the column names (first cell empty, followed by years)
+        for row in csv_reader:
+            if row and row[0] == '' and len(row) > 1 and row[1].strip().isdigit():
+                years = [int(year) for year in row[1:]]
+                break
+        else:
+            raise ValueError('No header row of years found in {}'.format(filepath))
+
+        countries = []
+        values = []
+        for row in csv_reader:
+            # Skip empty lines
+            if not row or row[0] == '':
+                continue
+            cells = row[1:len(years) + 1]
+            cells += [''] * (len(years) - len(cells))  # Rows with trailing missing data points may be shorter
+            countries.append(row[0])
+            values.append([parse_value(cell) for cell in cells])
+
+    return Table(np.array(values, dtype=np.float64).reshape(len(countries), len(years)), countries, years)
+
+
+def parse_world_bank(filepath):
+    ''' Parses a World Bank indicator file: 4 ID columns, one column per year and a blank column at the end '''
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as file:
+        csv_reader = csv.reader(file)
+
+        header = next(csv_reader)
+        year_columns = [j for j, name in enumerate(header) if name.strip().isdigit()]
+        years = [int(header[j]) for j in year_columns]
+
+        countries = []
+        country_codes = []
+        values = []
+        for row in csv_reader:
+            if not row or row[0] == '':
+                continue
+            countries.append(row[0])
+            country_codes.append(row[1])
+            values.append([parse_value(row[j]) for j in year_columns])
+
+    return Table(np.array(values, dtype=np.float64).reshape(len(countries), len(years)), countries, years,
+                 country_codes=country_codes)
+
+
+def file_hash(filepath):
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def write_atomically(filepath, write):
+    ''' Writes through a temporary file so readers never see a partially written cache
+
+        Every writer has its own temporary file (named <name>.<random>.tmp), so processes writing the same file at once
+        (e.g. render-graphs.py next to watch-graphs.py) don't write into each other's: the last one replaces it whole.
+    '''
+    file = tempfile.NamedTemporaryFile(dir=filepath.parent, prefix=filepath.name + '.', suffix='.tmp', delete=False)
+    try:
+        with file:
+            write(file)
+        # Temporary files are only readable by their owner: same permissions as a file created with open()
+        os.chmod(file.name, file_mode)
+        os.replace(file.name, filepath)
+    except BaseException:
+        try:
+            os.unlink(file.name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_cached_array(stem, values):
+    ''' Writes an array to the cache under a name of its content (e.g. GFEI-C3-Average-fuel-consumption-<hash>.npy),
+        returns the name
+
+        A cached array never changes once written, so an index naming it always describes its data, even if the
+        process writing the index crashes or another process writes the cache at the same time.
+    '''
+    values = np.ascontiguousarray(values)
+    sha256 = hashlib.sha256('{} {}'.format(values.dtype.str, values.shape).encode())
+    sha256.update(values.view(np.uint8))
+    filename = '{}-{}.npy'.format(stem, sha256.hexdigest()[:16])
+    if not (cache_directory / filename).exists():
+        write_atomically(cache_directory / filename, lambda file: np.save(file, values))
+    return filename
+
+
+def cached_filenames(index):
+    ''' Names of the cached arrays of a table index '''
+    if index is None:
+        return set()
+    filenames = {index.get('values')}
+    for interpolated in index.get('interpolated', {}).values():
+        if isinstance(interpolated, dict):
+            filenames.update([interpolated.get('values'), interpolated.get('imputed')])
+    return filenames - {None}
+
+
+def write_index(index_filepath, index, previous_index):
+    ''' Writes a table index after the arrays it names, then deletes the arrays only the previous index named '''
+    write_atomically(index_filepath, lambda file: file.write(json.dumps(index).encode()))
+    for filename in cached_filenames(previous_index) - cached_filenames(index):
+        try:
+            (cache_directory / filename).unlink()
+        except OSError:
+            pass  # Deleted by another process, or still open (on Windows)
+
+
+def load_table(filepath, parse, use_cache=True, interpolation=None):
+    ''' Loads a parsed Table from the binary cache, or parses filepath with parse() and caches the result
+
+        The cache of a table is an index (e.g. cache/GFEI-C3-Average-fuel-consumption.json: source file hash, countries,
+        years and the names of the arrays) written after the arrays it names (see write_cached_array).
+
+        interpolation: mode of interpolate to fill the gaps of the table with (None to leave them missing), the
+                       interpolated table being cached as well
+    '''
+    filepath = Path(filepath)
+    if not use_cache:
+        with profiling.stage('parse', file=filepath.name):
+            table = parse(filepath)
+        return table if interpolation is None else interpolated_table(table, interpolation, filepath)
+
+    index_filepath = cache_directory / (filepath.stem + '.json')
+    stat = filepath.stat()
+
+    try:
+        with open(index_filepath, 'r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        index = None
+    previous_index = index
+
+    table = None
+    if (index is not None and index.get('version') == cache_format_version
+            and (cache_directory / index['values']).exists()):
+        fresh = index['source-mtime-ns'] == stat.st_mtime_ns and index['source-size'] == stat.st_size
+        if not fresh and index['source-sha256'] == file_hash(filepath):
+            # Touched (e.g. by a checkout) but unchanged: keep the cache and remember the new modification time
+            index = dict(index, **{'source-mtime-ns': stat.st_mtime_ns, 'source-size': stat.st_size})
+            write_index(index_filepath, index, previous_index)
+            fresh = True
+        if fresh:
+            with profiling.stage('load-cache', file=filepath.name):
+                values = np.load(cache_directory / index['values'], mmap_mode='r')
+                table = Table(values, index['countries'], index['years'], country_codes=index['country-codes'])
+
+    if table is None:
+        with profiling.stage('parse', file=filepath.name):
+            table = parse(filepath)
+        cache_directory.mkdir(exist_ok=True)
+        # A new index: the interpolated tables of the previous data are out of date
+        index = {
+            'version': cache_format_version,
+            'source': filepath.name,
+            'source-mtime-ns': stat.st_mtime_ns,
+            'source-size': stat.st_size,
+            'source-sha256': file_hash(filepath),
+            'countries': table.countries,
+            'years': table.years,
+            'country-codes': table.country_codes,
+            'values': write_cached_array(filepath.stem, table.values)
+        }
+        write_index(index_filepath, index, previous_index)
+        previous_index = index
+    if interpolation is None:
+        return table
+
+    # Interpolated tables cached next to the parsed one, e.g. cache/GFEI-C3-Average-fuel-consumption-linear-<hash>.npy
+    interpolated = index.get('interpolated', {}).get(interpolation)
+    if (isinstance(interpolated, dict) and interpolated.get('version') == interpolation_version
+            and (cache_directory / interpolated['values']).exists()
+            and (cache_directory / interpolated['imputed']).exists()):
+        with profiling.stage('load-cache', file=interpolated['values']):
+            return Table(np.load(cache_directory / interpolated['values'], mmap_mode='r'), table.countries,
+                         table.years, country_codes=table.country_codes,
+                         imputed=np.load(cache_directory / interpolated['imputed'], mmap_mode='r'))
+    table = interpolated_table(table, interpolation, filepath)
+    interpolated = {
+        'version': interpolation_version,
+        'values': write_cached_array('{}-{}'.format(filepath.stem, interpolation), table.values),
+        'imputed': write_cached_array('{}-{}-imputed'.format(filepath.stem, interpolation), table.imputed)
+    }
+    index = dict(index, interpolated=dict(index.get('interpolated', {}), **{interpolation: interpolated}))
+    write_index(index_filepath, index, previous_index)
+    return table
+
+
+def interpolated_table(table, mode, filepath):
+    ''' Table with its gaps filled (see interpolate) '''
+    with profiling.stage('interpolate', file=Path(filepath).name):
+        values, imputed = interpolate(table.values, table.years, mode)
+    return Table(values, table.countries, table.years, country_codes=table.country_codes, imputed=imputed)
+
+
+def load_co2_emissions(use_cache=True, interpolation=None):
+    ''' GFEI table C.2: average CO2 emissions of new cars (g CO2/km, WLTP) '''
+    return load_table(co2_emissions_filepath, parse_gfei, use_cache, interpolation)
+
+
+def load_fuel_consumption(use_cache=True, interpolation=None):
+    ''' GFEI table C.3: average fuel consumption of new cars (Lge/100 km, WLTP) '''
+    return load_table(fuel_consumption_filepath, parse_gfei, use_cache, interpolation)
+
+
+def load_pump_prices(use_cache=True, interpolation=None):
+    ''' World Bank: pump price for gasoline (US$ per liter) '''
+    return load_table(pump_price_filepath, parse_world_bank, use_cache, interpolation)
+
+
+def world_bank_indicator_filepath(indicator_code):
+    ''' File of an indicator extracted from the WDI bulk download (see extract-wdi-indicators.py) '''
+    return data_directory / 'WorldBank-{}.csv'.format(indicator_code)
+
+
+def load_world_bank_indicator(indicator_code, use_cache=True, interpolation=None):
+    ''' Any World Bank indicator extracted by extract-wdi-indicators.py, e.g. 'NY.GDP.PCAP.CD' '''
+    return load_table(world_bank_indicator_filepath(indicator_code), parse_world_bank, use_cache, interpolation)
+
+
+# Data file of each table, by name
+filepaths = {
+    'co2-emissions': co2_emissions_filepath,
+    'fuel-consumption': fuel_consumption_filepath,
+    'pump-prices': pump_price_filepath
+}
+
+# Table loaders by name
+loaders = {
+    'co2-emissions': load_co2_emissions,
+    'fuel-consumption': load_fuel_consumption,
+    'pump-prices': load_pump_prices
+}
+
+
+def load(names, use_cache=True, interpolation=None):
+    ''' Loads the named tables (see loaders) into a dictionary, their gaps filled if interpolation is given (see
+        interpolate)
+    '''
+    return {name: loaders[name](use_cache, interpolation) for name in names}
@@ -0,0 +1,210 @@
+'''
+    Export of the graphs as static images (e.g. png, pdf), figure JSON or interactive HTML pages
+
+    This code uses static image export and requires additional dependencies: https://plot.ly/python/static-image-export/
+    Images are rendered by the render service when one is running (see render-service.py), so that the export engine
+    doesn't have to be launched again for every image, and are reused from the render cache when a figure is exported
+    again unchanged (see render_cache.py).
+'''
+
+from concurrent.futures import Future
+from pathlib import Path
+import json
+
+import datasets
+import profiling
+import render_cache
+import renderer
+import typed_arrays
+
+graphs_directory = Path(__file__).resolve().parent / 'graphs'
+
+# Path to orca executable (e.g. '[...]/orca/orca.exe'), if orca isn't on the PATH
+# Left as None, plotly uses its default image export engine (kaleido if installed, otherwise orca)
+orca_executable = None
+
+# Send figures to the render service when it is running (set to False to always render in this process)
+use_render_service = True
+
+# Reuse the images rendered before from the same figure specs and options (see render_cache.py)
+use_render_cache = True
+
+# Formats written as figure data rather than rendered as images
+data_formats = ['json', 'html']
+
+# Write the data arrays of figure JSON and HTML as base64 typed arrays (see typed_arrays.py)
+use_typed_arrays = True
+
+
+def plotly_io():
+    ''' plotly.io, imported on the first export rather than with this module (importing plotly is slow) '''
+    # Installing plotly: https://plot.ly/python/getting-started/
+    import plotly.io as pio
+
+    if orca_executable is not None:
+        pio.orca.config.executable = orca_executable
+    return pio
+
+
+def graph_filepath(filename, format='png'):
+    ''' Path of an exported graph, e.g. graphs/avg-co2-emissions-2017.png '''
+    return graphs_directory / '{}.{}'.format(filename, format)
+
+
+def render_pool(size):
+    ''' Running render service if there is one, otherwise a new local pool of size warm workers
+
+        Either way, the result has the RenderPool interface (submit, render, health_check, close).
+    '''
+    client = renderer.connect() if use_render_service else None
+    return client if client is not None else renderer.RenderPool(size=size)
+
+
+def write_bytes(image, filepath):
+    ''' Writes an image, replacing the file rather than writing into it (it may be a hard link to a cached image) '''
+    datasets.write_atomically(Path(filepath), lambda file: file.write(image))
+    return filepath
+
+
+def image_cache_key(fig, format='png'):
+    ''' Render cache key of the image of a figure, None if the render cache is off '''
+    if not use_render_cache:
+        return None
+    with profiling.stage('render-cache', 'hash figure'):
+        return render_cache.key(renderer.figure_dict(fig), format)
+
+
+def write_cached_image(key, filepath, format='png'):
+    ''' Writes the cached image of a render cache key to filepath, returns False if there is none '''
+    return key is not None and render_cache.write_cached(key, format, filepath)
+
+
+def write_rendered_image(image, key, filepath, format='png'):
+    ''' Writes a rendered image and adds it to the render cache (unless key is None) '''
+    if key is not None:
+        render_cache.store(key, format, image)
+    return write_bytes(image, filepath)
+
+
+def write_image(fig, filepath, format='png'):
+    ''' Exports a figure (go.Figure or figure dictionary, see charts.py) to an image file '''
+    with profiling.stage('export', file=Path(filepath).name):
+        fig = renderer.figure_dict(fig)
+        key = image_cache_key(fig, format)
+        if write_cached_image(key, filepath, format):
+            return filepath
+
+        client = renderer.connect() if use_render_service else None
+        if client is None:
+            # Figure specs are checked by check-figures.py, not on every export
+            image = plotly_io().to_image(fig, format=format, validate=False)
+        else:
+            with client:
+                image = client.render(fig, format=format)
+        return write_rendered_image(image, key, filepath, format)
+
+
+def submit_image(pool, fig, format='png', width=None, height=None, scale=None):
+    ''' Image of a figure (a Future of its bytes) from the render cache, or rendered by pool (a RenderPool or render
+        service client) and added to the render cache
+    '''
+    key = render_cache.key(renderer.figure_dict(fig), format, width, height, scale) if use_render_cache else None
+    image = render_cache.read(key, format) if key is not None else None
+    if image is not None:
+        future = Future()
+        future.set_result(image)
+        return future
+
+    future = pool.submit(fig, format=format, width=width, height=height, scale=scale)
+    if key is not None:
+        future.add_done_callback(lambda future: future.exception() or render_cache.store(key, format, future.result()))
+    return future
+
+
+def write_figures(figures, format='png', pool=None, jobs=1):
+    ''' Writes figures by output filepath, rendering the images that aren't in the render cache concurrently
+
+        Images are rendered by pool (a RenderPool or render service client) if given, otherwise by a new pool of up to
+        jobs workers, only started if an image has to be rendered. Returns whether each written file was reused from
+        the render cache by filepath.
+    '''
+    written = {}
+    if format in data_formats:
+        # Nothing to render: the figures are written as they are
+        for filepath, fig in figures.items():
+            written[write(fig, filepath, format)] = False
+        return written
+
+    keys = {}
+    to_render = {}
+    for filepath, fig in figures.items():
+        keys[filepath] = image_cache_key(fig, format)
+        if write_cached_image(keys[filepath], filepath, format):
+            written[filepath] = True
+        else:
+            to_render[filepath] = fig
+    if not to_render:
+        return written
+
+    new_pool = None
+    if pool is None:
+        with profiling.stage('start-pool'):
+            pool = new_pool = render_pool(size=max(1, min(jobs, len(to_render))))
+    try:
+        with profiling.stage('export'):
+            images = {filepath: pool.submit(fig, format=format) for filepath, fig in to_render.items()}
+            for filepath, image in images.items():
+                written[write_rendered_image(image.result(), keys[filepath], filepath, format)] = False
+    finally:
+        if new_pool is not None:
+            new_pool.close()
+    return written
+
+
+def figure_spec(fig, typed=None):
+    ''' Figure dictionary to write as JSON or HTML, with typed arrays if typed is True (default: use_typed_arrays) '''
+    spec = renderer.figure_dict(fig)
+    if use_typed_arrays if typed is None else typed:
+        spec = typed_arrays.encode(spec)
+    return spec
+
+
+def to_json(fig, typed=None):
+    ''' JSON of a figure, e.g. to be drawn by plotly.js in a web page (see figure_spec) '''
+    return plotly_io().to_json(figure_spec(fig, typed), validate=False)
+
+
+def to_html(fig, typed=None, include_plotlyjs=True):
+    ''' Interactive HTML page of a figure (include_plotlyjs: True to embed plotly.js, 'cdn' to link to it) '''
+    return plotly_io().to_html(figure_spec(fig, typed), include_plotlyjs=include_plotlyjs, validate=False)
+
+
+def write_json(fig, filepath, typed=None):
+    ''' Writes the JSON of a figure (read it back with read_json) '''
+    with profiling.stage('export', file=Path(filepath).name):
+        with open(filepath, 'w', encoding='utf-8') as file:
+            file.write(to_json(fig, typed))
+    return filepath
+
+
+def write_html(fig, filepath, typed=None, include_plotlyjs=True):
+    ''' Writes an interactive HTML page of a figure '''
+    with profiling.stage('export', file=Path(filepath).name):
+        with open(filepath, 'w', encoding='utf-8') as file:
+            file.write(to_html(fig, typed, include_plotlyjs))
+    return filepath
+
+
+def read_json(filepath):
+    ''' Figure dictionary of a JSON file written by write_json (typed arrays are read as NumPy arrays) '''
+    with open(filepath, 'r', encoding='utf-8') as file:
+        return typed_arrays.decode(json.load(file))
+
+
+def write(fig, filepath, format='png'):
+    ''' Writes a figure in any format: data formats (json, html) or images '''
+    if format == 'json':
+        return write_json(fig, filepath)
+    if format == 'html':
+        return write_html(fig, filepath)
+    return write_image(fig, filepath, format)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+'''
+    Extracts indicators from the World Bank WDI bulk download (WDI_CSV.zip) into data/
+
+    Each indicator is written in the format of the single-indicator World Bank downloads, e.g.
+    data/WorldBank-EP.PMP.SGAS.CD.csv, which datasets.load_world_bank_indicator() reads and caches. The archive is
+    streamed (see wdi.py) and doesn't need to be extracted.
+
+    Usage: python extract-wdi-indicators.py WDI_CSV.zip EP.PMP.SGAS.CD [more indicator codes] [--years 2005-2017]
+                                            [--countries gfei | all | CAN USA ...]
+'''
+
+import argparse
+import time
+
+import charts
+import countries
+import datasets
+import wdi
+
+
+def year_range(text):
+    first, _, last = text.partition('-')
+    return range(int(first), int(last or first) + 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filepath', help='WDI bulk download (ZIP archive or extracted data CSV file)')
+    parser.add_argument('indicators', nargs='+', help='Indicator codes, e.g. EP.PMP.SGAS.CD')
+    parser.add_argument('--years', type=year_range, help='Years to keep, e.g. 2005-2017 (default: all)')
+    parser.add_argument('--countries', nargs='+', default=['gfei'],
+                        help='ISO-3 codes of the countries to keep, "gfei" for the countries of country-list.txt '
+                             '(default) or "all" (including regional aggregates)')
+    args = parser.parse_args()
+
+    if args.countries == ['all']:
+        country_codes = None
+    elif args.countries == ['gfei']:
+        index = countries.CodeIndex()
+        country_codes = [index.code(name) for name in charts.read_country_list(charts.country_list_filepath)]
+    else:
+        country_codes = args.countries
+
+    start = time.perf_counter()
+    tables, names = wdi.read_indicators(args.filepath, args.indicators, country_codes=country_codes,
+                                        years=args.years)
+    for code, table in tables.items():
+        if not table.countries:
+            print('No rows for {} (check the indicator code)'.format(code))
+            continue
+        filepath = datasets.world_bank_indicator_filepath(code)
+        wdi.write_world_bank_csv(table, filepath, names[code], code)
+        print('Wrote', filepath, table)
+    print('Extracted {} indicator(s) in {:.1f}s'.format(len(tables), time.perf_counter() - start))
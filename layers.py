@@ -0,0 +1,192 @@
+'''
+    Graphs rendered in layers: a static background rendered once, under a foreground layer per variant
+
+    The variants of a graph drawn from a skeleton (e.g. the fuel consumption graph with each country highlighted in
+    turn, see charts.fuel_consumption_skeleton and render-country-graphs.py) share most of what they draw: the grey
+    lines of every country, the axes, the gridlines and the subtitle. A LayeredRenderer renders the skeleton once as
+    the background image, at the target size, and then only renders what each variant adds (the traces after the
+    skeleton's, the title and the other annotations) over it: the foreground layer is rendered on a transparent
+    background and composited onto the background image with Pillow, decoded once. Without Pillow, the background
+    image is drawn under the foreground layer by the export engine itself, as a layout image covering the whole figure
+    (which costs about as much as rendering the whole variant).
+
+    Both layers need the plot area and axes in the same place: the axis ranges plotly computes for a full variant
+    (autorange) are set on the layers of every variant, so the variants must share them (e.g. labels placed in paper
+    rather than data coordinates, which plotly would take into account). The lines the variant cuts out of the
+    skeleton (see charts.remove_background_lines) are drawn over in the plot's background color by the foreground
+    layer. Layered images are the same as the full renders up to antialiasing, and to the gridlines under the lines
+    drawn over.
+
+    Only raster formats (png, jpeg, webp) can be layered: the background is an image.
+'''
+
+from concurrent.futures import Future
+import base64
+import io
+import json
+
+import export
+
+raster_formats = ['png', 'jpeg', 'webp']
+
+transparent = 'rgba(0,0,0,0)'
+
+# Axis properties of the foreground layer: the axes are drawn by the background layer
+hidden_axis = dict(showgrid=False, zeroline=False, showline=False, showticklabels=False, ticks='')
+
+
+def pillow_image():
+    ''' PIL.Image, or None if Pillow isn't installed (the layers are then composited by the export engine) '''
+    # Installing Pillow: https://pillow.readthedocs.io/en/stable/installation.html
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def is_axis(name):
+    return name.startswith(('xaxis', 'yaxis'))
+
+
+def fixed_axes(layout, full_layout):
+    ''' Copy of a layout with the axis ranges computed by plotly (full_layout) set, instead of computed again '''
+    layout = dict(layout)
+    for name, axis in full_layout.items():
+        if is_axis(name) and 'range' in axis:
+            layout[name] = dict(layout.get(name, {}), range=axis['range'], autorange=False)
+    return layout
+
+
+def background_figure(skeleton, full_layout):
+    ''' Background layer: the skeleton's traces and layout '''
+    return {'data': skeleton['data'], 'layout': fixed_axes(skeleton['layout'], full_layout)}
+
+
+def background_image(image, full_layout):
+    ''' Layout image drawing a background image (PNG bytes) under everything else, over the whole figure '''
+    # Paper coordinates are those of the plot area: the figure extends past it by the margins
+    width, height, margin = full_layout['width'], full_layout['height'], full_layout['margin']
+    plot_width = width - margin['l'] - margin['r']
+    plot_height = height - margin['t'] - margin['b']
+    return dict(
+        source='data:image/png;base64,' + base64.b64encode(image).decode('ascii'),
+        xref='paper',
+        yref='paper',
+        x=-margin['l'] / plot_width,
+        y=1 + margin['t'] / plot_height,
+        sizex=width / plot_width,
+        sizey=height / plot_height,
+        xanchor='left',
+        yanchor='top',
+        sizing='stretch',
+        layer='below'
+    )
+
+
+def erased_lines(fig, skeleton, start):
+    ''' Traces drawing the skeleton's lines of the variant's own traces (from the index start on) in the plot's
+        background color, over the background layer's
+    '''
+    segments = skeleton.get('background_segments', {})
+    color = fig['layout'].get('plot_bgcolor', '#ffffff')
+    traces = []
+    for trace in fig['data'][start:]:
+        if trace.get('name') not in segments:
+            continue
+        trace_index, points = segments[trace['name']]
+        line = skeleton['data'][trace_index]
+        x, y = (line['x'], line['y']) if points is None else (line['x'][points], line['y'][points])
+        traces.append(dict(
+            type='scatter',
+            x=x,
+            y=y,
+            mode='lines',
+            # Wider than the line, for its antialiasing
+            line=dict(width=line.get('line', {}).get('width', 2) + 1, color=color),
+            hoverinfo='skip'
+        ))
+    return traces
+
+
+def foreground_figure(fig, skeleton, start, full_layout, background=None):
+    ''' Foreground layer of a variant of skeleton: the traces it adds (from the index start on) and its annotations,
+        over background (a layout image, see background_image) or on a transparent background
+
+        The variant's traces before start are the skeleton's, possibly with some lines cut out of them or removed (see
+        charts.highlight_fuel_consumption, which returns start): the background layer draws them, and the foreground
+        layer draws over the lines cut out (see erased_lines).
+    '''
+    layout = fixed_axes(fig['layout'], full_layout)
+    for name in layout:
+        if is_axis(name):
+            layout[name] = dict(layout[name], **hidden_axis)
+    skeleton_annotations = skeleton['layout'].get('annotations', [])
+    layout['annotations'] = [annotation for annotation in fig['layout'].get('annotations', [])
+                             if annotation not in skeleton_annotations]
+    layout['paper_bgcolor'] = transparent
+    layout['plot_bgcolor'] = transparent
+    if background is not None:
+        layout['images'] = list(layout.get('images', [])) + [background]
+    return {'data': erased_lines(fig, skeleton, start) + fig['data'][start:], 'layout': layout}
+
+
+class LayeredRenderer:
+    ''' Renders variants of a skeleton as a background layer rendered once and a foreground layer per variant
+
+        pool: RenderPool or render service client (see renderer.py) rendering the layers
+        reference: a variant whose axis ranges, as computed by plotly, every variant shares
+        format, width, height, scale: export options of the images (raster formats only)
+    '''
+
+    def __init__(self, pool, skeleton, reference, format='png', width=None, height=None, scale=None):
+        if format not in raster_formats:
+            raise ValueError('Only raster formats can be layered ({})'.format(', '.join(raster_formats)))
+        self.pool = pool
+        self.skeleton = skeleton
+        self.format = format
+        self.size = dict(width=width, height=height, scale=scale)
+
+        # Full layout of the reference variant, computed by plotly.js (the export engine's json format)
+        full_figure = export.submit_image(pool, reference, format='json', **self.size).result()
+        self.full_layout = json.loads(full_figure)['layout']
+        background_figure_spec = background_figure(skeleton, self.full_layout)
+        background = export.submit_image(pool, background_figure_spec, format='png', **self.size).result()
+        self.Image = pillow_image()
+        if self.Image is None:
+            self.background = background_image(background, self.full_layout)
+        else:
+            self.background = self.Image.open(io.BytesIO(background)).convert('RGBA')
+
+    def composite(self, foreground):
+        ''' Image bytes of a foreground layer (PNG bytes) composited onto the background image '''
+        image = self.Image.alpha_composite(self.background, self.Image.open(io.BytesIO(foreground)).convert('RGBA'))
+        if self.format == 'jpeg':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format=self.format)
+        return output.getvalue()
+
+    def submit(self, fig, start):
+        ''' Renders a variant of the skeleton whose own traces start at the index start, returns a Future of the image
+            bytes
+        '''
+        if self.Image is None:
+            foreground = foreground_figure(fig, self.skeleton, start, self.full_layout, self.background)
+            return export.submit_image(self.pool, foreground, format=self.format, **self.size)
+
+        # Composited once the foreground layer is rendered
+        foreground = foreground_figure(fig, self.skeleton, start, self.full_layout)
+        foreground_future = export.submit_image(self.pool, foreground, format='png', **self.size)
+        future = Future()
+
+        def composite(foreground_future):
+            try:
+                future.set_result(self.composite(foreground_future.result()))
+            except Exception as error:
+                future.set_exception(error)
+        foreground_future.add_done_callback(composite)
+        return future
+
+    def render(self, fig, start):
+        return self.submit(fig, start).result()
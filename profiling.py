@@ -0,0 +1,234 @@
+'''
+    Profiling of the graph pipelines (--profile flag of the chart scripts and render-graphs.py)
+
+    The pipelines are divided into stages (load, parse, organize, build, serialize, export, render) marked with
+    stage() or @timed. Stages cost nothing when profiling is off. With --profile, each stage's time is recorded, along
+    with its peak memory use (tracemalloc, --profile-memory), and the whole run can be captured with cProfile
+    (--profile-cprofile). Stages that run in render worker processes are sent back with the rendered images.
+
+    Two files are written to profiles/:
+        <name>-<date>.json         report: time of each stage (self time, excluding nested stages), peak memory, and
+                                   the functions with the highest cumulative time if cProfile was on
+        <name>-<date>.trace.json   Chrome trace-event file of every stage in every process: open it in
+                                   chrome://tracing or https://ui.perfetto.dev
+'''
+
+from pathlib import Path
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+profiles_directory = Path(__file__).resolve().parent / 'profiles'
+
+# Number of functions listed in the report when cProfile is on
+cprofile_functions = 30
+
+# Profiler of this process, None when profiling is off
+profiler = None
+
+
+def timestamp():
+    ''' Microseconds of the monotonic performance counter, which is shared by the processes of a machine '''
+    return time.perf_counter_ns() // 1000
+
+
+class Profiler:
+    ''' Records stages as Chrome trace events (complete "X" events, with self time and peak memory in their args) '''
+
+    def __init__(self, memory=False, process_name=None):
+        self.memory = memory
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        if process_name is not None:
+            self.events.append({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                                'args': {'name': process_name}})
+
+    def frames(self):
+        ''' Stages open in the calling thread, innermost last '''
+        if not hasattr(self.local, 'frames'):
+            self.local.frames = []
+        return self.local.frames
+
+    @contextlib.contextmanager
+    def stage(self, category, name=None, **args):
+        frames = self.frames()
+        frame = {'children (us)': 0, 'peak': 0}
+        if self.memory:
+            # Peak memory is tracked from the start of each stage: remember the enclosing stage's peak so far
+            current, peak = tracemalloc.get_traced_memory()
+            if frames:
+                frames[-1]['peak'] = max(frames[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start memory'] = current
+        frames.append(frame)
+        start = timestamp()
+        try:
+            yield
+        finally:
+            duration = timestamp() - start
+            frames.pop()
+            args['self (s)'] = (duration - frame['children (us)']) / 1e6
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame['peak'])
+                args['peak memory (bytes)'] = peak - frame['start memory']
+                if frames:
+                    frames[-1]['peak'] = max(frames[-1]['peak'], peak)
+            if frames:
+                frames[-1]['children (us)'] += duration
+            self.add_events([{'name': name or category, 'cat': category, 'ph': 'X', 'ts': start, 'dur': duration,
+                              'pid': os.getpid(), 'tid': threading.get_native_id(), 'args': args}])
+
+    def add_events(self, events):
+        with self.lock:
+            self.events.extend(events)
+
+    def report(self):
+        ''' Totals by stage category and by stage name '''
+        categories = {}
+        names = {}
+        for event in self.events:
+            if event['ph'] != 'X':
+                continue
+            for totals, key in ((categories, event['cat']), (names, event['name'])):
+                total = totals.setdefault(key, {'count': 0, 'total (s)': 0, 'self (s)': 0})
+                total['count'] += 1
+                total['total (s)'] += event['dur'] / 1e6
+                total['self (s)'] += event['args']['self (s)']
+                if 'peak memory (bytes)' in event['args']:
+                    total['peak memory (bytes)'] = max(total.get('peak memory (bytes)', 0),
+                                                       event['args']['peak memory (bytes)'])
+        return {'stages': categories, 'stages by name': names}
+
+
+def stage(category, name=None, **args):
+    ''' Context manager timing a stage of the pipeline when profiling is on, e.g. with stage('parse', file=...) '''
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(category, name, **args)
+
+
+def timed(category):
+    ''' Decorator timing every call of a function as a stage, named after the function '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if profiler is None:
+                return function(*args, **kwargs)
+            with profiler.stage(category, function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_events(events):
+    ''' Adds stages recorded in another process (e.g. by a render worker) '''
+    if profiler is not None and events:
+        profiler.add_events(events)
+
+
+def reset():
+    ''' Turns profiling off in a new worker process (forked processes inherit the profiler of their parent) '''
+    global profiler
+    profiler = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def worker_options():
+    ''' Profiling options to send to worker processes along with their jobs (None when profiling is off) '''
+    if profiler is None:
+        return None
+    return {'memory': profiler.memory}
+
+
+@contextlib.contextmanager
+def worker_job(options):
+    ''' Profiles a job in a worker process, yields the list its recorded events are added to '''
+    global profiler
+    events = []
+    if options is None:
+        yield events
+        return
+
+    profiler = Profiler(memory=options['memory'], process_name='render worker {}'.format(os.getpid()))
+    if profiler.memory:
+        tracemalloc.start()
+    try:
+        yield events
+    finally:
+        if profiler.memory:
+            tracemalloc.stop()
+        events.extend(profiler.events)
+        profiler = None
+
+
+def add_arguments(parser):
+    ''' Adds the profiling options to a script's argument parser '''
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', action='store_true', help='Write a stage report and a Chrome trace to profiles/')
+    group.add_argument('--profile-cprofile', action='store_true', help='Also capture the run with cProfile')
+    group.add_argument('--profile-memory', action='store_true',
+                       help='Also record the peak memory use of each stage (tracemalloc, slows the run down)')
+
+
+@contextlib.contextmanager
+def session(args, name):
+    ''' Profiles the enclosed code if --profile was given, then writes the report and trace files '''
+    global profiler
+    if not args.profile:
+        yield None
+        return
+
+    profiler = Profiler(memory=args.profile_memory, process_name=name)
+    if args.profile_memory:
+        tracemalloc.start()
+    cprofile = cProfile.Profile() if args.profile_cprofile else None
+    if cprofile is not None:
+        cprofile.enable()
+    start = timestamp()
+    try:
+        with profiler.stage('total', name):
+            yield profiler
+    finally:
+        if cprofile is not None:
+            cprofile.disable()
+        if args.profile_memory:
+            tracemalloc.stop()
+        write(profiler, name, start, cprofile)
+        profiler = None
+
+
+def write(profiler, name, start, cprofile=None):
+    profiles_directory.mkdir(exist_ok=True)
+    filepath_stem = profiles_directory / '{}-{}'.format(name, time.strftime('%Y%m%d-%H%M%S'))
+
+    report = {
+        'name': name,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'total (s)': (timestamp() - start) / 1e6
+    }
+    report.update(profiler.report())
+    if cprofile is not None:
+        cprofile.dump_stats(str(filepath_stem) + '.prof')  # e.g. for snakeviz
+        stats = pstats.Stats(cprofile)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:cprofile_functions]
+        report['cprofile'] = [{
+            'function': '{}:{}({})'.format(*function),
+            'calls': calls,
+            'self (s)': self_time,
+            'cumulative (s)': cumulative_time
+        } for function, (primitive_calls, calls, self_time, cumulative_time, callers) in functions]
+
+    with open(str(filepath_stem) + '.json', 'w') as file:
+        json.dump(report, file, indent=2)
+    with open(str(filepath_stem) + '.trace.json', 'w') as file:
+        json.dump({'traceEvents': profiler.events, 'displayTimeUnit': 'ms'}, file)
+    print('Wrote profile {}.json and {}.trace.json'.format(filepath_stem, filepath_stem.name))
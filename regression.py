@@ -0,0 +1,150 @@
+'''
+    Trend of the fuel consumption vs pump price scatter: regressions of the fuel consumption on the pump price, and
+    bootstrap confidence bands of the fitted curves (see charts.consumption_vs_price_figure)
+
+    Both models are log-linear, ln(consumption) = intercept + slope * price: the fuel consumption changes by the same
+    share for every extra dollar per litre. 'log-linear' is fitted by least squares, 'robust' by a Huber M-estimator
+    (iteratively reweighted least squares), which gives less weight to the countries far from the trend.
+
+    The fits are vectorized over rows, so that thousands of bootstrap resamples are fitted at once as a matrix. The
+    resamples are drawn in chunks of chunk_size, each from its own seed, and the chunks are fitted by a pool of
+    processes: the result only depends on the seed and the number of replicates, not on the number of processes.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+import math
+
+import numpy as np
+
+models = ['log-linear', 'robust']
+
+# Huber's tuning constant: 95% efficiency for normally distributed residuals
+huber_tuning = 1.345
+
+# Bootstrap resamples drawn (and fitted by a process) at a time
+chunk_size = 1000
+
+
+def weighted_fit(x, y, weights=None):
+    ''' Intercepts and slopes of the weighted least squares lines of every row of y on the same row of x '''
+    if weights is None:
+        weights = np.ones_like(x)
+    total_weights = weights.sum(axis=-1, keepdims=True)
+    x_mean = (weights * x).sum(axis=-1, keepdims=True) / total_weights
+    y_mean = (weights * y).sum(axis=-1, keepdims=True) / total_weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # NaN for the rows whose x are all the same (e.g. a resample of a single country)
+        slopes = ((weights * (x - x_mean) * (y - y_mean)).sum(axis=-1) /
+                  (weights * (x - x_mean) ** 2).sum(axis=-1))
+    return y_mean[..., 0] - slopes * x_mean[..., 0], slopes
+
+
+def fit_log_linear(x, y):
+    ''' Least squares fits of ln(y) on x, for every row '''
+    return weighted_fit(x, np.log(y))
+
+
+def fit_robust(x, y, max_iterations=50, tolerance=1e-8):
+    ''' Huber fits of ln(y) on x, for every row (iteratively reweighted least squares from the least squares fit,
+        until the coefficients of the row change by less than tolerance)
+    '''
+    shape = np.shape(x)[:-1]
+    x = np.reshape(x, (-1, np.shape(x)[-1]))
+    log_y = np.log(np.reshape(y, x.shape))
+    intercepts, slopes = weighted_fit(x, log_y)
+    # Rows still being fitted (most converge in a few iterations, a few take many more)
+    active = np.flatnonzero(~np.isnan(slopes))
+    for iteration in range(max_iterations):
+        if len(active) == 0:
+            break
+        active_x, active_log_y = x[active], log_y[active]
+        residuals = active_log_y - intercepts[active, None] - slopes[active, None] * active_x
+        # Scale of the residuals: median absolute deviation, scaled to the standard deviation of a normal distribution
+        scales = np.median(np.abs(residuals - np.median(residuals, axis=1, keepdims=True)), axis=1) / 0.6745
+        # A scale of 0: at least half of the points are on the line, which is the fit (the weights of the others would
+        # all be 0)
+        spread_rows = scales > 0
+        if not spread_rows.all():
+            active, active_x, active_log_y = active[spread_rows], active_x[spread_rows], active_log_y[spread_rows]
+            residuals, scales = residuals[spread_rows], scales[spread_rows]
+            if len(active) == 0:
+                break
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = np.minimum(1, huber_tuning * scales[:, None] / np.abs(residuals))
+        weights[~np.isfinite(weights)] = 1  # Residuals of 0, or a scale of 0
+        active_intercepts, active_slopes = weighted_fit(active_x, active_log_y, weights)
+        changes = np.maximum(np.abs(active_intercepts - intercepts[active]), np.abs(active_slopes - slopes[active]))
+        intercepts[active], slopes[active] = active_intercepts, active_slopes
+        active = active[changes > tolerance]
+    return intercepts.reshape(shape), slopes.reshape(shape)
+
+
+fits = {
+    'log-linear': fit_log_linear,
+    'robust': fit_robust
+}
+
+
+def bootstrap_chunk(x, y, model, replicates, seed):
+    ''' Intercepts and slopes of the model fitted to replicates resamples of the (x, y) points, drawn from seed '''
+    rng = np.random.default_rng(seed)
+    resamples = rng.integers(0, len(x), size=(replicates, len(x)))
+    return fits[model](x[resamples], y[resamples])
+
+
+def bootstrap(x, y, model='log-linear', replicates=10000, jobs=1, seed=0):
+    ''' Intercepts and slopes of the model fitted to bootstrap resamples of the (x, y) points (pairs resampled with
+        replacement), fitted by jobs processes
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    number_of_chunks = math.ceil(replicates / chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(number_of_chunks)
+    sizes = [min(chunk_size, replicates - i * chunk_size) for i in range(number_of_chunks)]
+    if jobs <= 1 or number_of_chunks == 1:
+        results = [bootstrap_chunk(x, y, model, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, number_of_chunks)) as executor:
+            results = list(executor.map(bootstrap_chunk, *zip(*[(x, y, model, size, chunk_seed)
+                                                                  for size, chunk_seed in zip(sizes, seeds)])))
+    return np.concatenate([intercepts for intercepts, slopes in results]), \
+        np.concatenate([slopes for intercepts, slopes in results])
+
+
+def trend(x, y, model='log-linear', replicates=10000, confidence=0.95, jobs=1, seed=0, points=100):
+    ''' Fitted curve of the fuel consumptions y on the pump prices x, and its bootstrap confidence band
+
+        Returns the model, the prices of the curve (points from the lowest to the highest price), the fitted
+        consumptions, the lower and upper bounds of the band at these prices (None if no resample could be fitted, e.g.
+        with very few countries), and the fitted intercept and slope.
+
+        Raises ValueError if there are fewer than two different prices to fit the trend to.
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if model not in fits:
+        raise ValueError('Unknown model {} (models: {})'.format(model, ', '.join(models)))
+    if len(np.unique(x)) < 2:
+        raise ValueError('A trend needs at least two different prices ({} countries, {} different prices)'.format(
+            len(x), len(np.unique(x))))
+    intercept, slope = (float(value) for value in fits[model](x, y))
+    intercepts, slopes = bootstrap(x, y, model, replicates, jobs, seed)
+    fitted = ~np.isnan(slopes)
+
+    curve_x = np.linspace(x.min(), x.max(), points)
+    lower = upper = None
+    if fitted.any():
+        # Curves of every resample: the band is the central confidence share of them at each price
+        curves = intercepts[fitted, None] + slopes[fitted, None] * curve_x
+        lower, upper = np.exp(np.percentile(curves, [50 * (1 - confidence), 50 * (1 + confidence)], axis=0))
+    return {
+        'model': model,
+        'x': curve_x,
+        'y': np.exp(intercept + slope * curve_x),
+        'lower': lower,
+        'upper': upper,
+        'intercept': intercept,
+        'slope': slope,
+        'confidence': confidence,
+        'replicates': int(fitted.sum())
+    }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+'''
+    "You vs the world" graphs: the CO2 emissions and fuel consumption graphs with each country of country-list.txt
+    highlighted in turn, e.g. graphs/countries/avg-fuel-consumption-france.png
+
+    The data is loaded once, and the parts of the figures that are the same whatever the highlighted country (see
+    charts.co2_emissions_skeleton and charts.fuel_consumption_skeleton) are built once: only the highlighted traces,
+    colors and labels are built for each country. The images are rendered in parallel by a pool of warm render workers
+    (those of the render service if it is running), and reused from the render cache when they didn't change.
+
+    With --layers, the fuel consumption graphs are rendered in layers (see layers.py): the skeleton is rendered once,
+    and only the lines and labels each country adds are rendered over it.
+
+    Usage: python render-country-graphs.py [--only co2 lines] [--countries France Japan] [--format png] [--jobs 4]
+           python render-country-graphs.py --layers    # Fuel consumption graphs over a background rendered once
+           python render-country-graphs.py --profile   # Stage report and Chrome trace in profiles/ (see profiling.py)
+'''
+
+import argparse
+import os
+import time
+
+import charts
+import countries
+import datasets
+import export
+import layers
+import profiling
+
+countries_directory = export.graphs_directory / 'countries'
+
+# File names of the graphs drawn for each country ({} is replaced with the country, see country_filename)
+country_graphs = {
+    'co2': 'avg-co2-emissions-2017-{}',
+    'lines': 'avg-fuel-consumption-{}'
+}
+
+
+def country_filename(country):
+    ''' e.g. "Russian Federation" -> "russian-federation" '''
+    return countries.normalize(country).replace(' ', '-')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(country_graphs), help='Graphs to draw (default: all)')
+    parser.add_argument('--countries', nargs='+',
+                        help='Countries to highlight (default: every country in country-list.txt)')
+    parser.add_argument('--format', default='png', help='Export format: png, pdf, svg, ..., html or json')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='Number of render workers (when no render service is running)')
+    parser.add_argument('--layers', action='store_true',
+                        help='Render the fuel consumption graphs over a background rendered once (see layers.py)')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    if args.layers and args.format not in layers.raster_formats:
+        parser.error('--layers only works with raster formats ({})'.format(', '.join(layers.raster_formats)))
+
+    with profiling.session(args, 'render-country-graphs'):
+        start = time.perf_counter()
+        graph_names = args.only or list(country_graphs)
+        country_names = charts.read_country_list(charts.country_list_filepath)
+        tables = datasets.load(sorted({table for name in graph_names for table in charts.graphs[name]['tables']}))
+
+        # Skeletons built once, and the functions drawing them with a highlighted country
+        highlight = {}
+        if 'co2' in graph_names:
+            co2_data = charts.co2_emissions_plotting_data(tables['co2-emissions'])
+            co2_skeleton = charts.co2_emissions_skeleton(co2_data)
+            highlight['co2'] = lambda country: charts.highlight_co2_emissions(co2_skeleton, co2_data, country)
+        if 'lines' in graph_names:
+            lines_data = charts.fuel_consumption_plotting_data(tables['fuel-consumption'])
+            lines_skeleton = charts.fuel_consumption_skeleton(lines_data, country_names)
+            # With where the highlighted traces start, to render them over the skeleton with --layers
+            highlight['lines'] = lambda country: charts.highlight_fuel_consumption(lines_skeleton, lines_data, country,
+                                                                                   return_start=True)
+
+        # Figures to render by output file path, by graph, and index of the first highlighted trace of the fuel
+        # consumption figures by file path
+        figures = {name: {} for name in graph_names}
+        highlight_starts = {}
+        for country in args.countries or country_names:
+            for name in graph_names:
+                try:
+                    fig = highlight[name](country)
+                except ValueError as error:
+                    print('Skipped {} for {}: {}'.format(name, country, error))
+                    continue
+                filename = country_graphs[name].format(country_filename(country))
+                filepath = countries_directory / '{}.{}'.format(filename, args.format)
+                if name == 'lines':
+                    fig, highlight_starts[filepath] = fig
+                figures[name][filepath] = fig
+        countries_directory.mkdir(parents=True, exist_ok=True)
+
+        # Fuel consumption graphs rendered in layers, the other graphs as a whole
+        layered_figures = figures.pop('lines', {}) if args.layers else {}
+        other_figures = {filepath: fig for graph_figures in figures.values() for filepath, fig in graph_figures.items()}
+        if not layered_figures:
+            written = export.write_figures(other_figures, format=args.format, jobs=args.jobs)
+        else:
+            written = {}
+            with profiling.stage('start-pool'):
+                pool = export.render_pool(size=max(1, min(args.jobs, len(layered_figures) + len(other_figures))))
+            with pool:
+                # Every country shares the axis ranges of the first one's graph
+                reference = next(iter(layered_figures.values()))
+                layered = layers.LayeredRenderer(pool, lines_skeleton, reference, format=args.format)
+                with profiling.stage('export', 'layered'):
+                    images = {filepath: layered.submit(fig, highlight_starts[filepath])
+                              for filepath, fig in layered_figures.items()}
+                    for filepath, image in images.items():
+                        written[export.write_bytes(image.result(), filepath)] = False
+                written.update(export.write_figures(other_figures, format=args.format, pool=pool))
+        cached = sum(written.values())
+        print('Wrote {} graph(s) to {} in {:.2f}s ({} rendered, {} from the render cache)'.format(
+            len(written), countries_directory, time.perf_counter() - start, len(written) - cached, cached))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+'''
+    Renders all graphs (or a subset of them) from a single process
+
+    Data is loaded once, every figure is built, then the figures are exported concurrently by a pool of warm render
+    workers (those of the render service if it is running, see render-service.py). Graphs are defined in charts.py.
+
+    Builds are incremental: graphs whose data, configuration and code didn't change since they were last built are
+    left as they are (see build.py).
+
+    Usage: python render-graphs.py [--only co2 lines scatter] [--format png] [--jobs 3]
+           python render-graphs.py --year 2012     # Graphs drawn for a given year (the scatter)
+           python render-graphs.py --all-years     # ... for every year with data (fuel-consumption-vs-price-2012.png)
+           python render-graphs.py --format html   # Interactive pages (or json: figure data, see export.py)
+           python render-graphs.py --dry-run       # Show which graphs would be built, and why
+           python render-graphs.py --profile       # Stage report and Chrome trace in profiles/ (see profiling.py)
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import build
+import charts
+import datasets
+import export
+import profiling
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(charts.graphs), help='Graphs to render (default: all)')
+    parser.add_argument('--format', default='png', help='Image format (e.g. png, pdf, svg), or html or json')
+    parser.add_argument('--year', type=int, help='Year to draw, for graphs drawn for a given year')
+    parser.add_argument('--all-years', action='store_true', help='Draw graphs for every year they have data for')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='Number of render workers (when no render service is running)')
+    parser.add_argument('--dry-run', action='store_true', help='Show which graphs would be built, and why')
+    parser.add_argument('--force', action='store_true', help='Build every graph again, even if it is up to date')
+    parser.add_argument('--no-render-cache', action='store_true',
+                        help='Render every graph again, even if an image of the same figure is in cache/renders')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    if args.no_render_cache:
+        export.use_render_cache = False
+        args.force = True
+
+    with profiling.session(args, 'render-graphs'):
+        start = time.perf_counter()
+        by_year = args.year is not None or args.all_years
+        graph_names = args.only or [name for name, graph in charts.graphs.items() if not by_year or 'years' in graph]
+        if by_year:
+            undated = [name for name in graph_names if 'years' not in charts.graphs[name]]
+            if undated:
+                parser.error('{} not drawn for a given year (--year and --all-years are for: {})'.format(
+                    ', '.join(undated), ', '.join(name for name, graph in charts.graphs.items() if 'years' in graph)))
+
+        # Outputs to build: graph name and year (None for graphs that aren't drawn by year) by output file name
+        outputs = {}
+        for name in graph_names:
+            graph = charts.graphs[name]
+            if not by_year:
+                outputs[graph['filename']] = (name, None)
+                continue
+
+            years = graph['years'](datasets.load(graph['tables']))
+            if args.year is not None:
+                if args.year not in years:
+                    parser.error('No data to draw {} for {} (years: {})'.format(name, args.year, years))
+                years = [args.year]
+            for year in years:
+                outputs['{}-{}'.format(graph['filename'], year)] = (name, year)
+
+        # Only build the outputs whose inputs changed since they were last built (see build.py)
+        manifest = build.Manifest()
+        inputs = {}
+        options = {}
+        stale_outputs = {}
+        for filename, (name, year) in outputs.items():
+            filepath = export.graph_filepath(filename, args.format)
+            inputs[filename] = build.graph_inputs(charts.graphs[name])
+            options[filename] = build.output_options(args.format, year)
+            reasons = ['forced'] if args.force else manifest.changes(filepath, inputs[filename], options[filename])
+            if reasons:
+                stale_outputs[filename] = (name, year)
+            if args.dry_run:
+                print('{}: {}'.format(build.relative_path(filepath),
+                                      'would build ({})'.format(', '.join(reasons)) if reasons else 'up to date'))
+        if args.dry_run:
+            sys.exit(0)
+
+        # Load every table needed by the graphs to build once
+        table_names = sorted({table for name, year in stale_outputs.values()
+                              for table in charts.graphs[name]['tables']})
+        tables = datasets.load(table_names)
+
+        # Figures to render by output file name
+        figures = {}
+        for filename, (name, year) in stale_outputs.items():
+            graph = charts.graphs[name]
+            figures[filename] = graph['figure'](tables) if year is None else graph['figure'](tables, year=year)
+
+        # Images of figures that were rendered before are reused from the render cache (see render_cache.py), the
+        # others are rendered in parallel by the pool's worker processes
+        filepaths = {export.graph_filepath(filename, args.format): filename for filename in figures}
+        written = export.write_figures({filepath: figures[filename] for filepath, filename in filepaths.items()},
+                                       format=args.format, jobs=args.jobs)
+        for filepath, cached in written.items():
+            print('Wrote {}{}'.format(filepath, ' (cached)' if cached else ''))
+            manifest.record(filepath, inputs[filepaths[filepath]], options[filepaths[filepath]])
+        manifest.save()
+
+        print('Built {} graph(s) in {:.2f}s ({} up to date)'.format(len(written), time.perf_counter() - start,
+                                                                   len(outputs) - len(stale_outputs)))
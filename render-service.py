@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+'''
+    Long-lived local render service
+
+    Keeps a pool of warm image export workers running (see renderer.py) so that the chart scripts, render-graphs.py
+    and other batch jobs don't pay the export engine's launch cost for every image. While it runs, export.py sends
+    figures to it automatically.
+
+    Usage: python render-service.py [--workers 2] [--timeout 60] [--port 6150]
+           python render-service.py --check  # Health check of a running service
+'''
+
+import argparse
+import json
+import signal
+import sys
+
+import renderer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help='Number of warm render worker processes')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds before a render job is abandoned')
+    parser.add_argument('--port', type=int, default=renderer.default_address[1], help='Port to listen on (localhost)')
+    parser.add_argument('--check', action='store_true', help='Print the health of a running service and exit')
+    args = parser.parse_args()
+    address = ('localhost', args.port)
+
+    if args.check:
+        client = renderer.connect(address)
+        if client is None:
+            print('No render service running on port {}'.format(args.port))
+            sys.exit(1)
+        with client:
+            health = client.health_check()
+        print(json.dumps(health, indent=2))
+        sys.exit(0 if health['ok'] else 1)
+
+    # Shut down cleanly when stopped with kill as well as with Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    with renderer.RenderPool(size=args.workers, timeout=args.timeout) as pool:
+        print('Render service ready on {}:{} with {} worker(s)'.format(*address, args.workers), flush=True)
+        try:
+            renderer.serve(pool, address)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,145 @@
+'''
+    Content-addressed cache of rendered images
+
+    A rendered image only depends on the figure spec, the export options (format, width, height, scale) and the export
+    engine, so it is stored under a hash of all of them: cache/renders/<first 2 characters>/<hash>.<format>. When a
+    figure is exported again unchanged (same data, same code), the stored image is hard-linked (or copied, where hard
+    links aren't possible) to the output file, without starting a renderer.
+
+    The cache is bounded in size: when it grows past max_size, the least recently used images are deleted (an image's
+    modification time is updated whenever it is used).
+'''
+
+from pathlib import Path
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+import datasets
+import typed_arrays
+
+cache_directory = Path(__file__).resolve().parent / 'cache' / 'renders'
+
+# Total size (bytes) of the cached images above which the least recently used ones are deleted
+max_size = 256 * 2 ** 20
+
+# Bump when the key format changes to invalidate existing caches
+cache_format_version = 1
+
+
+@functools.lru_cache(maxsize=1)
+def engine_versions():
+    ''' Versions of the packages rendering the images: a new version may render them differently '''
+    versions = {}
+    for package in ('plotly', 'kaleido'):
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def json_default(value):
+    ''' NumPy scalars (e.g. np.int64) as Python numbers '''
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('{} is not JSON serializable'.format(type(value).__name__))
+
+
+def key(fig, format='png', width=None, height=None, scale=None, engine=None):
+    ''' Hash of a figure spec (a dictionary, see renderer.figure_dict), its export options and the export engine '''
+    spec = json.dumps({
+        'version': cache_format_version,
+        'figure': typed_arrays.encode(fig),  # Arrays as base64, much faster to hash than as lists of numbers
+        'options': {'format': format, 'width': width, 'height': height, 'scale': scale},
+        'engine': engine if engine is not None else engine_versions()
+    }, sort_keys=True, separators=(',', ':'), default=json_default)
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+def image_filepath(key, format):
+    return cache_directory / key[:2] / '{}.{}'.format(key, format)
+
+
+def link(source, filepath):
+    ''' Replaces filepath with a hard link to source, or a copy of it where hard links aren't possible '''
+    if filepath.exists() and os.path.samefile(source, filepath):
+        return  # Linked already (and renaming a link over another link to the same file does nothing)
+    # A temporary name of its own, which processes linking the same file at once don't share
+    temporary_filepath = filepath.with_name('{}.{}.tmp'.format(filepath.name, uuid.uuid4().hex))
+    try:
+        try:
+            os.link(source, temporary_filepath)
+        except OSError:
+            shutil.copyfile(source, temporary_filepath)
+        os.replace(temporary_filepath, filepath)
+    finally:
+        # Left if the replace failed, or did nothing because another process linked filepath to source meanwhile
+        if os.path.lexists(temporary_filepath):
+            os.unlink(temporary_filepath)
+
+
+def write_cached(key, format, filepath):
+    ''' Writes the cached image of key to filepath, returns False if it isn't cached '''
+    cached_filepath = image_filepath(key, format)
+    try:
+        os.utime(cached_filepath)  # Most recently used
+    except FileNotFoundError:
+        return False
+    link(cached_filepath, Path(filepath))
+    return True
+
+
+def read(key, format):
+    ''' Cached image of key (bytes), None if it isn't cached '''
+    cached_filepath = image_filepath(key, format)
+    try:
+        os.utime(cached_filepath)  # Most recently used
+        with open(cached_filepath, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def store(key, format, image):
+    ''' Adds a rendered image to the cache, then deletes the least recently used images if it is over max_size '''
+    cached_filepath = image_filepath(key, format)
+    cached_filepath.parent.mkdir(parents=True, exist_ok=True)
+    datasets.write_atomically(cached_filepath, lambda file: file.write(image))
+    evict(max_size)
+    return cached_filepath
+
+
+def evict(size):
+    ''' Deletes the least recently used images until the cache holds at most size bytes '''
+    if not cache_directory.exists():
+        return
+    images = []
+    for filepath in cache_directory.glob('*/*'):
+        if filepath.name.endswith('.tmp'):
+            continue  # Being written
+        try:
+            stat = filepath.stat()
+        except FileNotFoundError:
+            continue  # Evicted by another process
+        images.append((stat.st_mtime_ns, stat.st_size, filepath))
+
+    total_size = sum(image_size for mtime, image_size, filepath in images)
+    for mtime, image_size, filepath in sorted(images):
+        if total_size <= size:
+            break
+        try:
+            filepath.unlink()
+        except FileNotFoundError:
+            pass
+        total_size -= image_size
+
+
+def clear():
+    evict(0)
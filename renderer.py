@@ -0,0 +1,308 @@
+'''
+    Warm image renderers
+
+    Starting the image export engine (kaleido's Chromium, or orca's Electron) is what dominates the time to export one
+    graph. A RenderPool keeps a few worker processes alive with the engine already started, and feeds them figures from a
+    job queue, so only the first render pays the launch cost. A hung or crashed worker is replaced after its job times
+    out.
+
+    The pool can also be shared by several scripts as a long-lived local service (see render-service.py):
+    serve() runs a pool behind a socket on localhost and RenderServiceClient submits figures to it.
+'''
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import threading
+import time
+
+import profiling
+
+default_address = ('localhost', 6150)
+# Secret shared by the service and its clients, readable only by the user who started the service
+authkey_filepath = Path(__file__).resolve().parent / 'cache' / 'render-service.key'
+
+# Tiny figure used to start the export engine and to check that workers respond
+health_check_figure = {'data': [{'type': 'scatter', 'x': [0, 1], 'y': [0, 1]}], 'layout': {}}
+
+
+class RenderTimeoutError(Exception):
+    pass
+
+
+class RenderError(Exception):
+    pass
+
+
+def figure_dict(fig):
+    ''' Figures are sent to the workers as plain dictionaries (go.Figure validation doesn't need to run again) '''
+    if not hasattr(fig, 'to_dict'):
+        return fig
+    with profiling.stage('serialize', 'figure to_dict'):
+        return fig.to_dict()
+
+
+def worker_loop(connection, warm_up):
+    ''' Runs in a worker process: renders the figures received on connection until it receives None '''
+    # Ctrl+C is handled by the parent process, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    profiling.reset()
+    # Plotly (and the orca path, if one is set) comes from export.py, which also imports this module
+    import export
+    pio = export.plotly_io()
+
+    if warm_up:
+        pio.to_image(health_check_figure, format='png')
+    connection.send('ready')
+
+    while True:
+        job = connection.recv()
+        if job is None:
+            break
+        fig, options, profile = job
+        # Stages of the job are sent back with its result when the submitting process is profiling
+        with profiling.worker_job(profile) as events:
+            try:
+                with profiling.stage('render', format=options['format']):
+                    result = ('ok', pio.to_image(fig, validate=False, **options))
+            except Exception as error:
+                result = ('error', '{}: {}'.format(type(error).__name__, error))
+        connection.send(result + (events,))
+
+
+class RenderPool:
+    ''' Pool of warm worker processes rendering figures to image bytes (png, pdf, svg, ...)
+
+        size: number of worker processes (each runs its own export engine)
+        timeout: seconds after which a job fails with RenderTimeoutError and its worker is replaced
+        warm_up: start each worker's export engine before accepting jobs
+    '''
+
+    def __init__(self, size=2, timeout=60, warm_up=True):
+        self.size = size
+        self.timeout = timeout
+        self.warm_up = warm_up
+        self.jobs = queue.Queue()
+        self.workers = [None] * size
+        self.closed = False
+
+        # Start the workers in parallel, then wait for them to be ready
+        for slot in range(size):
+            self.workers[slot] = self.start_worker()
+        for slot in range(size):
+            self.wait_until_ready(slot)
+
+        self.threads = [threading.Thread(target=self.dispatch, args=(slot,), daemon=True) for slot in range(size)]
+        for thread in self.threads:
+            thread.start()
+
+    def start_worker(self):
+        connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=worker_loop, args=(worker_connection, self.warm_up), daemon=True)
+        process.start()
+        worker_connection.close()
+        return process, connection
+
+    def wait_until_ready(self, slot):
+        process, connection = self.workers[slot]
+        # The first launch of the export engine can be slow, allow it more than a render
+        if not connection.poll(max(self.timeout, 60)) or connection.recv() != 'ready':
+            raise RenderError('Render worker failed to start')
+
+    def restart_worker(self, slot):
+        process, connection = self.workers[slot]
+        process.kill()
+        process.join()
+        connection.close()
+        self.workers[slot] = self.start_worker()
+        self.wait_until_ready(slot)
+
+    def dispatch(self, slot):
+        ''' Runs in one thread per worker: sends queued jobs to the worker and resolves their futures '''
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            future, job = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            process, connection = self.workers[slot]
+            try:
+                connection.send(job)
+                if not connection.poll(self.timeout):
+                    raise RenderTimeoutError('Render took longer than {}s'.format(self.timeout))
+                status, result, events = connection.recv()
+            except (RenderTimeoutError, EOFError, OSError) as error:
+                if not isinstance(error, RenderTimeoutError):
+                    error = RenderError('Render worker died ({})'.format(error))
+                future.set_exception(error)
+                try:
+                    self.restart_worker(slot)
+                except RenderError:
+                    pass  # Retried on the next job
+                continue
+
+            # Stages recorded by the worker, for the process that submitted the job (see serve())
+            future.profile_events = events
+            profiling.add_events(events)
+            if status == 'ok':
+                future.set_result(result)
+            else:
+                future.set_exception(RenderError(result))
+
+    def submit(self, fig, format='png', width=None, height=None, scale=None, profile=None):
+        ''' Queues a figure for rendering and returns a Future of the image bytes
+
+            profile: profiling options of the worker (by default, those of this process, see profiling.worker_options)
+        '''
+        if self.closed:
+            raise RuntimeError('RenderPool is closed')
+        options = {'format': format, 'width': width, 'height': height, 'scale': scale}
+        if profile is None:
+            profile = profiling.worker_options()
+        future = Future()
+        self.jobs.put((future, (figure_dict(fig), options, profile)))
+        return future
+
+    def render(self, fig, format='png', width=None, height=None, scale=None):
+        ''' Renders a figure and returns the image bytes '''
+        return self.submit(fig, format, width, height, scale).result()
+
+    def health_check(self, timeout=10):
+        ''' Checks that the workers are alive and renders a tiny figure '''
+        start = time.perf_counter()
+        try:
+            self.submit(health_check_figure).result(timeout)
+            rendered = True
+        except Exception:
+            rendered = False
+        alive = sum(process.is_alive() for process, connection in self.workers)
+        return {
+            'ok': rendered and alive == self.size,
+            'workers': self.size,
+            'alive': alive,
+            'queued': self.jobs.qsize(),
+            'latency (s)': round(time.perf_counter() - start, 3)
+        }
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for thread in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        for process, connection in self.workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def read_authkey():
+    with open(authkey_filepath, 'rb') as file:
+        return file.read()
+
+
+def serve(pool, address=default_address):
+    ''' Serves render requests from RenderServiceClient instances until interrupted '''
+    authkey = secrets.token_bytes(32)
+    authkey_filepath.parent.mkdir(exist_ok=True)
+    descriptor = os.open(authkey_filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(authkey)
+
+    def handle(connection):
+        with connection:
+            try:
+                request = connection.recv()
+                if request[0] == 'render':
+                    fig, options, profile = request[1], request[2], request[3]
+                    future = pool.submit(fig, profile=profile, **options)
+                    try:
+                        connection.send(('ok', future.result(), getattr(future, 'profile_events', None)))
+                    except Exception as error:
+                        connection.send(('error', '{}: {}'.format(type(error).__name__, error)))
+                elif request[0] == 'health':
+                    connection.send(('ok', pool.health_check()))
+                elif request[0] == 'ping':
+                    connection.send(('ok', 'pong'))
+            except (EOFError, OSError):
+                pass
+
+    with Listener(address, backlog=64, authkey=authkey) as listener:
+        while True:
+            try:
+                connection = listener.accept()
+            except (OSError, EOFError):
+                continue  # e.g. a client with the wrong key
+            threading.Thread(target=handle, args=(connection,), daemon=True).start()
+
+
+class RenderServiceClient:
+    ''' Submits figures to a running render service (same interface as RenderPool) '''
+
+    def __init__(self, address=default_address, concurrency=8):
+        self.address = address
+        self.authkey = read_authkey()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def request(self, *request):
+        with Client(self.address, authkey=self.authkey) as connection:
+            connection.send(request)
+            response = connection.recv()
+        if response[0] != 'ok':
+            raise RenderError(response[1])
+        if request[0] == 'render':
+            profiling.add_events(response[2])  # Stages of the service's worker
+        return response[1]
+
+    def submit(self, fig, format='png', width=None, height=None, scale=None):
+        options = {'format': format, 'width': width, 'height': height, 'scale': scale}
+        return self.executor.submit(self.request, 'render', figure_dict(fig), options, profiling.worker_options())
+
+    def render(self, fig, format='png', width=None, height=None, scale=None):
+        return self.submit(fig, format, width, height, scale).result()
+
+    def health_check(self):
+        return self.request('health')
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def connect(address=default_address):
+    ''' Client of the render service if one is running, otherwise None '''
+    try:
+        client = RenderServiceClient(address)
+    except OSError:
+        return None  # Never started
+    try:
+        client.request('ping')
+        return client
+    except (OSError, EOFError, RenderError, multiprocessing.AuthenticationError):
+        client.close()
+        return None
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+'''
+    Shows the parsed data tables, or exports them as CSV files
+
+    Data only: this doesn't import plotly (see check-startup.py), so it starts as fast as the data can be loaded.
+
+    Usage: python show-tables.py                                   # Summary of every table
+           python show-tables.py fuel-consumption --country Canada  # Values of countries
+           python show-tables.py pump-prices --csv pump-prices.csv  # Table as a country x year CSV file
+           python show-tables.py fuel-consumption --interpolation linear --country Canada   # Gaps filled (*)
+'''
+
+import argparse
+import csv
+
+import numpy as np
+
+import datasets
+
+
+def summary(name, table):
+    missing_share = np.count_nonzero(np.isnan(table.values)) / max(table.values.size, 1)
+    text = '{:<18} {} countries x {} years ({}-{}), {:.0%} missing'.format(
+        name, len(table.countries), len(table.years), table.years[0], table.years[-1], missing_share)
+    if table.imputed is not None:
+        text += ', {:.0%} interpolated'.format(np.count_nonzero(table.imputed) / max(table.values.size, 1))
+    return text
+
+
+def write_csv(table, filepath):
+    ''' Writes a table with one row per country and one column per year (empty cells for missing data points) '''
+    with open(filepath, 'w', encoding='utf-8', newline='') as file:
+        csv_writer = csv.writer(file)
+        csv_writer.writerow(['Country'] + table.years)
+        for country, values in zip(table.countries, table.values):
+            csv_writer.writerow([country] + ['' if np.isnan(value) else '{:g}'.format(value) for value in values])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tables', nargs='*', help='Tables to show: {} (default: all)'.format(', '.join(datasets.loaders)))
+    parser.add_argument('--country', nargs='+', help='Print the values of these countries')
+    parser.add_argument('--csv', help='Write the table to a CSV file (one table only)')
+    parser.add_argument('--no-cache', action='store_true', help='Parse the data files again instead of using cache/')
+    parser.add_argument('--interpolation', choices=datasets.interpolation_modes,
+                        help='Fill the missing years between data points (see datasets.interpolate)')
+    args = parser.parse_args()
+
+    names = args.tables or list(datasets.loaders)
+    unknown_names = [name for name in names if name not in datasets.loaders]
+    if unknown_names:
+        parser.error('Unknown table(s): {} (tables: {})'.format(', '.join(unknown_names), ', '.join(datasets.loaders)))
+    if args.csv is not None and len(names) != 1:
+        parser.error('--csv writes a single table, name it')
+    tables = datasets.load(names, use_cache=not args.no_cache, interpolation=args.interpolation)
+
+    for name, table in tables.items():
+        print(summary(name, table))
+        for country in args.country or []:
+            if country not in table.country_index:
+                print('  {}: not in the table'.format(country))
+                continue
+            years, values = table.series(country)
+            imputed = table.imputed_series(country)
+            print('  {}: {}'.format(country, ', '.join('{} {:g}{}'.format(year, value, '*' if is_imputed else '')
+                                                       for year, value, is_imputed in zip(years, values, imputed))))
+        if args.csv is not None:
+            write_csv(table, args.csv)
+            print('Wrote', args.csv)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+'''
+    Watches the data, the country list and the chart definitions, and exports the graphs they change again
+
+    The data stays loaded and the render workers stay warm between changes, so a graph is exported again about as fast
+    as its figure can be built and rendered. A change is only acted on once its files stop changing (see watcher.py),
+    and only the graphs drawn from a changed file are built again (see build.py). Changes to the chart definitions
+    (charts.py, colormap.py, countries.py) are reloaded: an error in them is reported, and the graphs are built again
+    once it is fixed. Changes to other modules need a restart.
+
+    Usage: python watch-graphs.py [--only lines scatter] [--format png] [--jobs 3]
+           python watch-graphs.py --polling   # Check the files for changes every --interval seconds (without inotify)
+'''
+
+from contextlib import nullcontext
+from pathlib import Path
+import argparse
+import importlib
+import os
+import signal
+import time
+import traceback
+
+import build
+import charts
+import colormap
+import countries
+import datasets
+import export
+import watcher
+
+# Modules reloaded when they change, in import order
+chart_modules = [colormap, countries, charts]
+
+
+def reload_chart_modules():
+    ''' Reloads the chart definitions, returns False (after printing the error) if they can't be imported '''
+    try:
+        for module in chart_modules:
+            importlib.reload(module)
+    except Exception:
+        traceback.print_exc()
+        return False
+    return True
+
+
+def build_graphs(graph_names, tables, changed_filepaths, format, manifest, pool):
+    ''' Builds the out-of-date graphs of graph_names, parsing the changed data files again '''
+    start = time.perf_counter()
+    for name, filepath in datasets.filepaths.items():
+        if name in tables and filepath in changed_filepaths:
+            del tables[name]
+
+    figures = {}
+    inputs = {}
+    options = build.output_options(format)
+    for name in graph_names:
+        graph = charts.graphs[name]
+        filepath = export.graph_filepath(graph['filename'], format)
+        inputs[filepath] = build.graph_inputs(graph)
+        if not manifest.changes(filepath, inputs[filepath], options):
+            continue
+        try:
+            tables.update(datasets.load([table for table in graph['tables'] if table not in tables]))
+            figures[filepath] = graph['figure'](tables)
+        except Exception:
+            traceback.print_exc()
+            print('Failed to build', name)
+
+    written = export.write_figures(figures, format=format, pool=pool)
+    for filepath, cached in written.items():
+        print('Wrote {}{}'.format(filepath, ' (cached)' if cached else ''))
+        manifest.record(filepath, inputs[filepath], options)
+    manifest.save()
+    if written:
+        print('Built {} graph(s) in {:.2f}s'.format(len(written), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(charts.graphs), help='Graphs to watch (default: all)')
+    parser.add_argument('--format', default='png', help='Export format: png, pdf, svg, ..., html or json')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='Number of render workers (when no render service is running)')
+    parser.add_argument('--polling', action='store_true', help='Poll the files for changes instead of using inotify')
+    parser.add_argument('--interval', type=float, default=0.2, help='Seconds between polls (with --polling)')
+    parser.add_argument('--debounce', type=float, default=0.1,
+                        help='Seconds without changes to wait for before building the graphs')
+    args = parser.parse_args()
+
+    graph_names = args.only or list(charts.graphs)
+    chart_filepaths = {Path(module.__file__).resolve() for module in chart_modules}
+    watched_filepaths = {Path(filepath).resolve() for name in graph_names
+                         for filepath in build.graph_inputs(charts.graphs[name])}
+
+    # Shut down cleanly when stopped with kill as well as with Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    # Render workers started once, kept warm between changes
+    pool = None
+    if args.format not in export.data_formats:
+        pool = export.render_pool(size=max(1, min(args.jobs, len(graph_names))))
+
+    with pool or nullcontext():
+        # Watching from before the first build, so that changes made during it aren't missed
+        files_watcher = watcher.watch(watched_filepaths, polling=args.polling, interval=args.interval)
+        tables = {}
+        manifest = build.Manifest()
+        build_graphs(graph_names, tables, set(), args.format, manifest, pool)
+
+        print('Watching {} file(s) ({}), Ctrl+C to stop'.format(
+            len(watched_filepaths), 'polling' if isinstance(files_watcher, watcher.PollingWatcher) else 'inotify'))
+        try:
+            while True:
+                changed_filepaths = watcher.wait_for_changes(files_watcher, args.debounce)
+                print('Changed:', ', '.join(build.relative_path(filepath) for filepath in sorted(changed_filepaths)))
+
+                other_code = changed_filepaths & (set(build.code_filepaths) - chart_filepaths)
+                if other_code:
+                    # Graphs built with the code loaded at startup would be recorded as built with the new code
+                    print('Restart watch-graphs.py to use the changes to',
+                          ', '.join(filepath.name for filepath in sorted(other_code)))
+                    continue
+                if changed_filepaths & chart_filepaths and not reload_chart_modules():
+                    continue
+                changed_graphs = [name for name in graph_names
+                                  if changed_filepaths & {Path(filepath).resolve()
+                                                          for filepath in build.graph_inputs(charts.graphs[name])}]
+                build_graphs(changed_graphs, tables, changed_filepaths, args.format, manifest, pool)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            files_watcher.close()
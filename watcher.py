@@ -0,0 +1,149 @@
+'''
+    Watching files for changes (see watch-graphs.py)
+
+    On Linux, changes are reported by the kernel through inotify (read with ctypes, without any extra dependency): the
+    directories of the watched files are watched rather than the files themselves, so that files replaced by a rename
+    (as many editors save them) are still seen. Elsewhere, or if inotify isn't available, the files are polled: their
+    modification time and size are checked every interval seconds.
+
+    Editors and spreadsheet programs usually write a file in several steps, so changes are debounced: wait_for_changes
+    returns once no more changes arrive for a short quiet period.
+'''
+
+from pathlib import Path
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+watched_events = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event header: watch descriptor, mask, cookie, length of the name that follows
+event_header = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    ''' Changes of files reported by inotify (Linux) '''
+
+    def __init__(self, filepaths):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError('C library not found')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+
+        self.filepaths = {Path(filepath).resolve() for filepath in filepaths}
+        self.descriptor = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.descriptor < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}  # Directories by watch descriptor
+        for directory in sorted({filepath.parent for filepath in self.filepaths}):
+            watch = libc.inotify_add_watch(self.descriptor, str(directory).encode(), watched_events)
+            if watch < 0:
+                os.close(self.descriptor)
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for {}'.format(directory))
+            self.directories[watch] = directory
+
+    def wait(self, timeout=None):
+        ''' Watched files changed within timeout seconds (None: until one changes), as a set of paths '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.descriptor], [], [], remaining)
+            if not readable:
+                return set()
+            changes = self.read_events()
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def read_events(self):
+        changes = set()
+        while True:
+            try:
+                buffer = os.read(self.descriptor, 64 * 1024)
+            except BlockingIOError:
+                return changes
+            offset = 0
+            while offset < len(buffer):
+                watch, mask, cookie, name_length = event_header.unpack_from(buffer, offset)
+                offset += event_header.size
+                name = buffer[offset:offset + name_length].rstrip(b'\0').decode(errors='surrogateescape')
+                offset += name_length
+                filepath = self.directories.get(watch, Path()) / name
+                if filepath in self.filepaths:
+                    changes.add(filepath)
+
+    def close(self):
+        os.close(self.descriptor)
+
+
+class PollingWatcher:
+    ''' Changes of files found by checking their modification time and size every interval seconds '''
+
+    def __init__(self, filepaths, interval=0.2):
+        self.interval = interval
+        self.states = {Path(filepath).resolve(): None for filepath in filepaths}
+        self.poll()
+
+    @staticmethod
+    def state(filepath):
+        try:
+            stat = filepath.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        changes = set()
+        for filepath, state in self.states.items():
+            new_state = self.state(filepath)
+            if new_state != state:
+                self.states[filepath] = new_state
+                changes.add(filepath)
+        return changes
+
+    def wait(self, timeout=None):
+        ''' Watched files changed within timeout seconds (None: until one changes), as a set of paths '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+            changes = self.poll()
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def close(self):
+        pass
+
+
+def watch(filepaths, polling=False, interval=0.2):
+    ''' Watcher of files: inotify where it is available (unless polling is True), otherwise polling '''
+    if not polling:
+        try:
+            return InotifyWatcher(filepaths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(filepaths, interval)
+
+
+def wait_for_changes(watcher, debounce=0.1):
+    ''' Waits for watched files to change, then until no more changes arrive for debounce seconds '''
+    changes = watcher.wait()
+    while True:
+        more_changes = watcher.wait(debounce)
+        if not more_changes:
+            return changes
+        changes |= more_changes
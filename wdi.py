@@ -0,0 +1,100 @@
+'''
+    Streaming extraction of indicators from the World Bank World Development Indicators (WDI) bulk download
+
+    The bulk download (https://datacatalog.worldbank.org/dataset/world-development-indicators, WDI_CSV.zip) holds every
+    indicator for every country in one CSV file of several gigabytes. It is read directly from the ZIP archive, one line
+    at a time: lines are only parsed when they mention one of the requested indicator codes, and only the rows of
+    requested countries and the requested year columns are kept. Memory use stays flat whatever the size of the file.
+
+    Extracted indicators are Tables (see datasets.py), like the other data sources.
+'''
+
+from pathlib import Path
+import contextlib
+import csv
+import io
+import zipfile
+
+import numpy as np
+
+from datasets import Table, parse_value
+
+# Name of the data file in the archive (WDIData.csv in older releases)
+data_member_names = ['WDICSV.csv', 'WDIData.csv']
+
+
+@contextlib.contextmanager
+def open_data_file(filepath):
+    ''' Text stream of the WDI data file, read from the ZIP archive without extracting it (or from a plain CSV file),
+        closed with the archive when the with block ends
+    '''
+    filepath = Path(filepath)
+    if not zipfile.is_zipfile(filepath):
+        with open(filepath, 'r', encoding='utf-8-sig', newline='') as file:
+            yield file
+        return
+
+    with zipfile.ZipFile(filepath) as archive:
+        names = archive.namelist()
+        member = next((name for name in names if Path(name).name in data_member_names), None)
+        if member is None:
+            # Otherwise the largest CSV file (the other files hold country and series metadata)
+            csv_members = [info for info in archive.infolist() if info.filename.lower().endswith('.csv')]
+            if not csv_members:
+                raise ValueError('No CSV file in {}'.format(filepath))
+            member = max(csv_members, key=lambda info: info.file_size).filename
+        with io.TextIOWrapper(archive.open(member), encoding='utf-8-sig', newline='') as file:
+            yield file
+
+
+def read_indicators(filepath, indicator_codes, country_codes=None, years=None):
+    ''' Reads indicators (e.g. ['EP.PMP.SGAS.CD']) from the WDI bulk download
+
+        Returns Tables by indicator code and indicator names (e.g. 'Pump price for gasoline (US$ per liter)') by code.
+
+        country_codes: ISO-3 codes of the countries to keep (default: all, including regional aggregates)
+        years: years to keep (default: all)
+    '''
+    indicator_codes = list(indicator_codes)
+    country_codes = set(country_codes) if country_codes is not None else None
+    # Indicator codes appear quoted in the data lines, which is much cheaper to look for than parsing every line
+    quoted_codes = ['"{}"'.format(code) for code in indicator_codes] + [',{},'.format(code) for code in indicator_codes]
+
+    rows = {code: {'name': '', 'countries': [], 'country-codes': [], 'values': []} for code in indicator_codes}
+    with open_data_file(filepath) as file:
+        header = next(csv.reader([file.readline()]))
+        indicator_column = header.index('Indicator Code')
+        year_columns = [j for j, name in enumerate(header)
+                        if name.strip().isdigit() and (years is None or int(name) in years)]
+        kept_years = [int(header[j]) for j in year_columns]
+
+        for line in file:
+            if not any(code in line for code in quoted_codes):
+                continue
+            row = next(csv.reader([line]))
+            indicator = rows.get(row[indicator_column])
+            if indicator is None or (country_codes is not None and row[1] not in country_codes):
+                continue
+            indicator['name'] = row[2]
+            indicator['countries'].append(row[0])
+            indicator['country-codes'].append(row[1])
+            indicator['values'].append([parse_value(row[j]) if j < len(row) else np.nan for j in year_columns])
+
+    tables = {}
+    names = {}
+    for code, indicator in rows.items():
+        values = np.array(indicator['values'], dtype=np.float64).reshape(len(indicator['countries']), len(kept_years))
+        tables[code] = Table(values, indicator['countries'], kept_years, country_codes=indicator['country-codes'])
+        names[code] = indicator['name']
+    return tables, names
+
+
+def write_world_bank_csv(table, filepath, indicator_name, indicator_code):
+    ''' Writes a Table in the format of single-indicator World Bank downloads (see datasets.parse_world_bank) '''
+    with open(filepath, 'w', encoding='utf-8', newline='') as file:
+        csv_writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        csv_writer.writerow(['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code'] +
+                            [str(year) for year in table.years] + [''])
+        for country, country_code, values in zip(table.countries, table.country_codes, table.values):
+            csv_writer.writerow([country, country_code, indicator_name, indicator_code] +
+                                ['' if np.isnan(value) else '{:g}'.format(value) for value in values] + [''])